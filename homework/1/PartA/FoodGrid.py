@@ -0,0 +1,78 @@
+# Uniform grid over the food squares of PartA, so eating only looks at the
+# food around the player instead of every square on the screen.
+#
+# Every food gets an id; a square is filed under each grid cell it touches,
+# and adding or removing one only touches those few cells. The food is also
+# drawn onto a layer of its own as it comes and goes, so a frame blits that
+# one layer however much food there is. With a maxFood the oldest food is
+# taken away to make room for more, so the food can't pile up forever.
+
+import pygame
+
+
+class FoodGrid:
+
+    def __init__(self, size, color, background, cellSize=40, maxFood=None):
+        self.cellSize = cellSize
+        self.maxFood = maxFood
+        self.cells = {}         # (cx, cy) -> {food id: None}, in the order added
+        self.foods = {}         # food id -> rect, oldest first
+        self.nextId = 0
+        self.color = color
+        self.background = background
+        # the background color is transparent, so the layer can go over the player
+        self.layer = pygame.Surface(size)
+        self.layer.fill(background)
+        self.layer.set_colorkey(background)
+
+    def __len__(self):
+        return len(self.foods)
+
+    def cellRange(self, rect):
+        size = self.cellSize
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def add(self, rect):
+        # file the food and draw it; returns its id
+        if self.maxFood is not None and len(self.foods) >= self.maxFood:
+            self.remove(next(iter(self.foods)))
+        foodId = self.nextId
+        self.nextId += 1
+        self.foods[foodId] = rect
+        columns, rows = self.cellRange(rect)
+        for cx in columns:
+            for cy in rows:
+                self.cells.setdefault((cx, cy), {})[foodId] = None
+        pygame.draw.rect(self.layer, self.color, rect)
+        return foodId
+
+    def remove(self, foodId):
+        rect = self.foods.pop(foodId)
+        columns, rows = self.cellRange(rect)
+        for cx in columns:
+            for cy in rows:
+                cell = self.cells[cx, cy]
+                del cell[foodId]
+                if not cell:
+                    del self.cells[cx, cy]
+        # rub the food out and put back any other food it was lying on
+        self.layer.set_clip(rect)
+        self.layer.fill(self.background)
+        for otherId in self.colliding(rect):
+            pygame.draw.rect(self.layer, self.color, self.foods[otherId])
+        self.layer.set_clip(None)
+
+    def colliding(self, rect):
+        # ids of the food overlapping rect, oldest first
+        found = {}
+        columns, rows = self.cellRange(rect)
+        for cx in columns:
+            for cy in rows:
+                for foodId in self.cells.get((cx, cy), ()):
+                    if foodId not in found and rect.colliderect(self.foods[foodId]):
+                        found[foodId] = None
+        return sorted(found)
+
+    def draw(self, surface):
+        surface.blit(self.layer, (0, 0))
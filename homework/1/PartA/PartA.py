@@ -2,16 +2,12 @@
 import pygame, sys, random
 from pygame.locals import *
 
-# Set up pygame.
-pygame.init()
-mainClock = pygame.time.Clock()
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, COLLISION, DRAW, FLIP
+from FoodGrid import FoodGrid
 
 # Set up the window.
 WINDOWWIDTH = 400
 WINDOWHEIGHT = 400
-windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT),
-0, 32)
-pygame.display.set_caption('Collision Detection')
 
 # Set up the colors.
 BLACK = (0, 0, 0)
@@ -23,107 +19,155 @@ b=0
 c=0
 
 # Set up the player and food data structures.
-foodCounter = 0
 NEWFOOD = 40
 FOODSIZE = 20
-player = pygame.Rect(300, 100, 50, 50)
-foods = []
-for i in range(20):
- foods.append(pygame.Rect(random.randint(0, WINDOWWIDTH - FOODSIZE),
-   random.randint(0, WINDOWHEIGHT - FOODSIZE), FOODSIZE, FOODSIZE))
-
-# Set up movement variables.
-moveLeft = False
-moveRight = False
-moveUp = False
-moveDown = False
+# past this much food the oldest is taken away as more comes; it is about
+# enough to cover the window
+MAXFOOD = (WINDOWWIDTH // FOODSIZE) * (WINDOWHEIGHT // FOODSIZE)
 
 MOVESPEED = 6
 
-def changeColor():
-    a = random.randint(10, 255)
-    b = random.randint(10, 255)
-    c = random.randint(10, 255)
+def changeColor(rng=random):
+    a = rng.randint(10, 255)
+    b = rng.randint(10, 255)
+    c = rng.randint(10, 255)
     return(a,b,c)
 
-# Run the game loop.
-while True:
- # Check for events.
- for event in pygame.event.get():
-     if event.type == QUIT:
-        pygame.quit()
-        sys.exit()
-     if event.type == KEYDOWN:
-         # Change the keyboard variables.
-         if event.key == K_LEFT or event.key == K_a:
-             moveRight = False
-             moveLeft = True
-         if event.key == K_RIGHT or event.key == K_d:
-             moveLeft = False
-             moveRight = True
-         if event.key == K_UP or event.key == K_w:
-             moveDown = False
-             moveUp = True
-         if event.key == K_DOWN or event.key == K_s:
-             moveUp = False
-             moveDown = True
-     if event.type == KEYUP:
-         if event.key == K_ESCAPE:
-             pygame.quit()
-             sys.exit()
-         if event.key == K_LEFT or event.key == K_a:
-             moveLeft = False
-         if event.key == K_RIGHT or event.key == K_d:
-             moveRight = False
-         if event.key == K_UP or event.key == K_w:
-             moveUp = False
-         if event.key == K_DOWN or event.key == K_s:
-             moveDown = False
-         if event.key == K_t:
-             player.top = random.randint(0, WINDOWHEIGHT -
-               player.height)
-             player.left = random.randint(0, WINDOWWIDTH -
-               player.width)
-
-     if event.type == MOUSEBUTTONUP:
-         foods.append(pygame.Rect(event.pos[0], event.pos[1],
-           FOODSIZE, FOODSIZE))
-
- foodCounter += 1
- if foodCounter >= NEWFOOD:
-     # Add new food.
-     foodCounter = 0
-     foods.append(pygame.Rect(random.randint(0, WINDOWWIDTH -
-       FOODSIZE), random.randint(0, WINDOWHEIGHT - FOODSIZE),
-       FOODSIZE, FOODSIZE))
-
- # Draw the white background onto the surface.
- windowSurface.fill(WHITE)
-
- # Move the player.
- if moveDown and player.bottom < WINDOWHEIGHT:
-     player.top += MOVESPEED
- if moveUp and player.top > 0:
-     player.top -= MOVESPEED
- if moveLeft and player.left > 0:
-     player.left -= MOVESPEED
- if moveRight and player.right < WINDOWWIDTH:
-     player.right += MOVESPEED
-
- # Draw the player onto the surface.
- pygame.draw.rect(windowSurface, PLAYER_COLOR, player)
-
- # Check whether the player has intersected with any food squares.
- for food in foods[:]:
-     if player.colliderect(food):
+# The steps of a frame, kept out of the game loop so they can be run
+# without a window (see homework/Benchmark.py).
+
+def addFood(foods, rng=random):
+    foods.add(pygame.Rect(rng.randint(0, WINDOWWIDTH - FOODSIZE),
+      rng.randint(0, WINDOWHEIGHT - FOODSIZE), FOODSIZE, FOODSIZE))
+
+def growFood(foods, foodCounter, rng=random):
+    # Count a frame towards the next food and add it when it is due.
+    # Returns the new count.
+    foodCounter += 1
+    if foodCounter >= NEWFOOD:
+        # Add new food.
+        foodCounter = 0
+        addFood(foods, rng)
+    return foodCounter
+
+def movePlayer(player, moveLeft, moveRight, moveUp, moveDown):
+    if moveDown and player.bottom < WINDOWHEIGHT:
+        player.top += MOVESPEED
+    if moveUp and player.top > 0:
+        player.top -= MOVESPEED
+    if moveLeft and player.left > 0:
+        player.left -= MOVESPEED
+    if moveRight and player.right < WINDOWWIDTH:
+        player.right += MOVESPEED
+
+def eatFood(player, foods, color, rng=random):
+    # Remove the food the player overlaps. Returns the player's color,
+    # changed for every square eaten.
+    for food in foods.colliding(player):
         foods.remove(food)
 
         # change color
-        PLAYER_COLOR = changeColor()
- # Draw the food.
- for i in range(len(foods)):
-     pygame.draw.rect(windowSurface, GREEN, foods[i])
-
- # Draw the window onto the screen.
- pygame.display.update()
- mainClock.tick(40)
\ No newline at end of file
+        color = changeColor(rng)
+    return color
+
+def main():
+    # Set up pygame.
+    pygame.init()
+    mainClock = pygame.time.Clock()
+
+    windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT),
+    0, 32)
+    pygame.display.set_caption('Collision Detection')
+
+    playerColor = PLAYER_COLOR
+    foodCounter = 0
+    player = pygame.Rect(300, 100, 50, 50)
+    # the food, filed by where it is and drawn on a layer of its own
+    foods = FoodGrid((WINDOWWIDTH, WINDOWHEIGHT), GREEN, WHITE, maxFood=MAXFOOD)
+    for i in range(20):
+        addFood(foods)
+
+    # Set up movement variables.
+    moveLeft = False
+    moveRight = False
+    moveUp = False
+    moveDown = False
+
+    # Run the game loop.
+    while True:
+        # Check for events.
+        PROFILER.begin(INPUT)
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == KEYDOWN:
+                # Change the keyboard variables.
+                if event.key == K_LEFT or event.key == K_a:
+                    moveRight = False
+                    moveLeft = True
+                if event.key == K_RIGHT or event.key == K_d:
+                    moveLeft = False
+                    moveRight = True
+                if event.key == K_UP or event.key == K_w:
+                    moveDown = False
+                    moveUp = True
+                if event.key == K_DOWN or event.key == K_s:
+                    moveUp = False
+                    moveDown = True
+            if event.type == KEYUP:
+                if event.key == K_ESCAPE:
+                    pygame.quit()
+                    sys.exit()
+                if event.key == K_LEFT or event.key == K_a:
+                    moveLeft = False
+                if event.key == K_RIGHT or event.key == K_d:
+                    moveRight = False
+                if event.key == K_UP or event.key == K_w:
+                    moveUp = False
+                if event.key == K_DOWN or event.key == K_s:
+                    moveDown = False
+                if event.key == K_t:
+                    player.top = random.randint(0, WINDOWHEIGHT -
+                      player.height)
+                    player.left = random.randint(0, WINDOWWIDTH -
+                      player.width)
+
+            if event.type == MOUSEBUTTONUP:
+                foods.add(pygame.Rect(event.pos[0], event.pos[1],
+                  FOODSIZE, FOODSIZE))
+
+        PROFILER.begin(UPDATE)
+        foodCounter = growFood(foods, foodCounter)
+
+        # Draw the white background onto the surface.
+        PROFILER.begin(DRAW)
+        windowSurface.fill(WHITE)
+
+        # Move the player.
+        PROFILER.begin(UPDATE)
+        movePlayer(player, moveLeft, moveRight, moveUp, moveDown)
+
+        # Draw the player onto the surface.
+        PROFILER.begin(DRAW)
+        pygame.draw.rect(windowSurface, playerColor, player)
+
+        # Check whether the player has intersected with any food squares.
+        PROFILER.begin(COLLISION)
+        playerColor = eatFood(player, foods, playerColor)
+
+        # Draw the food.
+        PROFILER.begin(DRAW)
+        foods.draw(windowSurface)
+        PROFILER.end_phase()
+        PROFILER.draw(windowSurface)
+
+        # Draw the window onto the screen.
+        PROFILER.begin(FLIP)
+        pygame.display.update()
+        PROFILER.end_phase()
+        mainClock.tick(40)
+        PROFILER.end_frame()
+
+if __name__ == '__main__':
+    main()
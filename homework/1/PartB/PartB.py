@@ -4,6 +4,8 @@ import pygame, sys, time
 from pygame.locals import *
 from random import *
 
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, DRAW, FLIP
+
 # Set up pygame.
 pygame.init()
 
@@ -47,6 +49,7 @@ def moveAllDown():
     # Run the game loop.
 while True:
     # Check for the QUIT event.
+    PROFILER.begin(INPUT)
     for event in pygame.event.get():
         if event.type == QUIT:
             pygame.quit()
@@ -62,9 +65,7 @@ while True:
         elif event.type == KEYDOWN and event.key == K_DOWN:
             moveAllDown()
 
-    # Draw the white background onto the surface.
-    windowSurface.fill(WHITE)
-
+    PROFILER.begin(UPDATE)
     for b in boxes:
         # Move the box data structure.
         if b['dir'] == DOWNLEFT:
@@ -107,9 +108,19 @@ while True:
             if b['dir'] == UPRIGHT:
                 b['dir'] = UPLEFT
 
+    # Draw the white background onto the surface.
+    PROFILER.begin(DRAW)
+    windowSurface.fill(WHITE)
+
+    for b in boxes:
         # Draw the box onto the surface.
         pygame.draw.rect(windowSurface, b['color'], b['rect'])
+    PROFILER.end_phase()
+    PROFILER.draw(windowSurface)
 
     # Draw the window onto the screen.
+    PROFILER.begin(FLIP)
     pygame.display.update()
+    PROFILER.end_phase()
     time.sleep(0.02)
+    PROFILER.end_frame()
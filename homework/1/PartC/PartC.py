@@ -2,6 +2,8 @@
 import pygame, sys, time, random
 from pygame.locals import *
 
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, COLLISION, DRAW, FLIP
+
 
 class ImageRect(pygame.Rect):
     def __init__(self, image, *args):
@@ -65,6 +67,7 @@ musicPlaying = True
 # run the game loop
 while True:
     # check for the QUIT event
+    PROFILER.begin(INPUT)
     for event in pygame.event.get():
         if event.type == QUIT:
             pygame.quit()
@@ -108,6 +111,7 @@ while True:
         if event.type == MOUSEBUTTONUP:
             foods.append(ImageRect(random.choice((peanutButterImage, jellyImage)), event.pos[0] - 10, event.pos[1] - 10, 20, 20))
 
+    PROFILER.begin(UPDATE)
     foodCounter += 1
     if foodCounter >= NEWFOOD:
         # add new food
@@ -122,9 +126,11 @@ while True:
         foods.append(rect)
 
     # draw the black background onto the surface
+    PROFILER.begin(DRAW)
     windowSurface.fill(BLACK)
 
     # move the player
+    PROFILER.begin(UPDATE)
     if moveDown and player.bottom < WINDOW_HEIGHT:
         player.top += MOVESPEED
     if moveUp and player.top > 0:
@@ -135,9 +141,11 @@ while True:
         player.right += MOVESPEED
 
     # draw the block onto the surface
+    PROFILER.begin(DRAW)
     windowSurface.blit(playerStretchedImage, player)
 
     # check if the block has intersected with any food squares.
+    PROFILER.begin(COLLISION)
     for food in foods[:]:
         if player.colliderect(food):
             foods.remove(food)
@@ -147,9 +155,15 @@ while True:
                 pickUpSound.play()
 
     # draw the food
+    PROFILER.begin(DRAW)
     for food in foods:
         windowSurface.blit(food.image, food)
+    PROFILER.end_phase()
+    PROFILER.draw(windowSurface)
 
     # draw the window onto the screen
+    PROFILER.begin(FLIP)
     pygame.display.update()
-    mainClock.tick(40)
\ No newline at end of file
+    PROFILER.end_phase()
+    mainClock.tick(40)
+    PROFILER.end_frame()
\ No newline at end of file
@@ -1,6 +1,13 @@
-import pygame, random, sys
+import pygame, sys
 from pygame.locals import *
 
+from homework.common.TextCache import render_text
+from homework.common.Rng import RNG, SPAWNER
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, COLLISION, DRAW, FLIP
+
+# baddies are spawned from their own seeded stream (set GAMES_SEED to replay a run)
+spawner = RNG.stream(SPAWNER)
+
 WINDOWWIDTH = 600
 WINDOWHEIGHT = 600
 TEXTCOLOR = (0, 0, 0)
@@ -35,192 +42,224 @@ def playerHasHitBaddie(playerRect, baddies, cheat):
                 return True
     return False
 
-def drawText(text, font, surface, x, y):
-    textobj = font.render(text, 1, TEXTCOLOR)
+def drawText(text, font, surface, x, y, cache=True):
+    textobj = render_text(font, text, 1, TEXTCOLOR, cache=cache)
     textrect = textobj.get_rect()
     textrect.topleft = (x, y)
     surface.blit(textobj, textrect)
 
-# Set up pygame, the window, and the mouse cursor.
-pygame.init()
-mainClock = pygame.time.Clock()
-windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
-pygame.display.set_caption('Dodger')
-pygame.mouse.set_visible(False)
-
-# Set up the fonts.
-font = pygame.font.SysFont(None, 48)
-
-# Set up sounds.
-gameOverSound = pygame.mixer.Sound('gameover.wav')
-pygame.mixer.music.load('background.wav')
-
-# Set up images.
-playerImage = pygame.image.load('player.png')
-playerRect = playerImage.get_rect()
-baddieImage = pygame.image.load('baddie.png')
-
-# Show the "Start" screen.
-windowSurface.fill(BACKGROUNDCOLOR)
-drawText('Dodger', font, windowSurface, (WINDOWWIDTH / 3), (WINDOWHEIGHT / 3))
-drawText('Press a key to start.', font, windowSurface, (WINDOWWIDTH / 3) - 30, (WINDOWHEIGHT / 3) + 50)
-pygame.display.update()
-waitForPlayerToPressKey()
-
-topScore = 0
-while True:
-    # Set up the start of the game.
-    baddies = []
-    score = 0
-    playerRect.topleft = (WINDOWWIDTH / 2, WINDOWHEIGHT - 50)
-    moveLeft = moveRight = moveUp = moveDown = False
-    reverseCheat = slowCheat = invCheat = False
-    baddieAddCounter = 0
-    pygame.mixer.music.play(-1, 0.0)
-
-    while True: # The game loop runs while the game part is playing.
-        score += 1 # Increase score.
+# The steps of a frame, kept out of the game loop so they can be run
+# without a window (see homework/Benchmark.py).
 
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                terminate()
+def newBaddie(baddieImage, rng=spawner):
+    superBaddie = (19 < rng.randint(1, 20))
+    bouncingBaddie = (15 < rng.randint(1, 20))
+    if(superBaddie):
+        baddieSize = rng.randint(BADDIEMINSIZE + BADDIEMAXSIZE, BADDIEMAXSIZE * 2)
+    else:
+        baddieSize = rng.randint(BADDIEMINSIZE, BADDIEMAXSIZE)
+    if(bouncingBaddie):
+        return {
+            'rect': pygame.Rect(rng.randint(0, WINDOWWIDTH - baddieSize), 0 - baddieSize, baddieSize,
+                                baddieSize),
+            'speed': rng.randint(BADDIEMINSPEED, BADDIEMAXSPEED),
+            'horizSpeed': rng.randint(BADDIEMINSPEED, BOUNCINGBADDIESPEEDMAX),
+            'surface': pygame.transform.scale(baddieImage, (baddieSize, baddieSize)),
+            }
+    else:
+        return {'rect': pygame.Rect(rng.randint(0, WINDOWWIDTH - baddieSize), 0 - baddieSize, baddieSize, baddieSize),
+                'speed': rng.randint(BADDIEMINSPEED, BADDIEMAXSPEED),
+                'horizSpeed': 0,
+                'surface':pygame.transform.scale(baddieImage, (baddieSize, baddieSize)),
+                }
 
-            if event.type == KEYDOWN:
-                if event.key == K_z:
-                    reverseCheat = True
-                if event.key == K_x:
-                    slowCheat = True
-                if event.key == K_c:
-                    invCheat = True
-                if event.key == K_LEFT or event.key == K_a:
-                    moveRight = False
-                    moveLeft = True
-                if event.key == K_RIGHT or event.key == K_d:
-                    moveLeft = False
-                    moveRight = True
-                if event.key == K_UP or event.key == K_w:
-                    moveDown = False
-                    moveUp = True
-                if event.key == K_DOWN or event.key == K_s:
-                    moveUp = False
-                    moveDown = True
-
-            if event.type == KEYUP:
-                if event.key == K_z:
-                    reverseCheat = False
-                    score = 0
-                if event.key == K_x:
-                    slowCheat = False
-                    score = 0
-                if event.key == K_c:
-                    invCheat = False
-                    score = 0
-                if event.key == K_ESCAPE:
-                        terminate()
-
-                if event.key == K_LEFT or event.key == K_a:
-                    moveLeft = False
-                if event.key == K_RIGHT or event.key == K_d:
-                    moveRight = False
-                if event.key == K_UP or event.key == K_w:
-                    moveUp = False
-                if event.key == K_DOWN or event.key == K_s:
-                    moveDown = False
-
-            if event.type == MOUSEMOTION:
-                # If the mouse moves, move the player where to the cursor.
-                playerRect.centerx = event.pos[0]
-                playerRect.centery = event.pos[1]
-        # Add new baddies at the top of the screen, if needed.
+def updateBaddies(baddies, baddieAddCounter, baddieImage, reverseCheat=False, slowCheat=False,
+                  rng=spawner, addRate=ADDNEWBADDIERATE):
+    # Add a baddie every addRate frames, move them all and drop the ones
+    # that have fallen off the window. Returns the new baddieAddCounter.
+
+    # Add new baddies at the top of the screen, if needed.
+    if not reverseCheat and not slowCheat:
+        baddieAddCounter += 1
+    if baddieAddCounter == addRate:
+        baddieAddCounter = 0
+        baddies.append(newBaddie(baddieImage, rng))
+
+    # Move the baddies down.
+    for b in baddies:
         if not reverseCheat and not slowCheat:
-            baddieAddCounter += 1
-        if baddieAddCounter == ADDNEWBADDIERATE:
-            baddieAddCounter = 0
-            superBaddie = (19 < random.randint(1, 20))
-            bouncingBaddie = (15 < random.randint(1, 20))
-            if(superBaddie):
-                baddieSize = random.randint(BADDIEMINSIZE + BADDIEMAXSIZE, BADDIEMAXSIZE * 2)
-            else:
-                baddieSize = random.randint(BADDIEMINSIZE, BADDIEMAXSIZE)
-            if(bouncingBaddie):
-                newBaddie = {
-                    'rect': pygame.Rect(random.randint(0, WINDOWWIDTH - baddieSize), 0 - baddieSize, baddieSize,
-                                        baddieSize),
-                    'speed': random.randint(BADDIEMINSPEED, BADDIEMAXSPEED),
-                    'horizSpeed': random.randint(BADDIEMINSPEED, BOUNCINGBADDIESPEEDMAX),
-                    'surface': pygame.transform.scale(baddieImage, (baddieSize, baddieSize)),
-                    }
+            if(b['rect'].right + b['horizSpeed'] >= WINDOWWIDTH):
+                b['rect'].move_ip(WINDOWWIDTH - b['rect'].right, b['speed'])
+                b['horizSpeed'] = -b['horizSpeed']
+            elif(b['rect'].left + b['horizSpeed'] <= 0):
+                b['rect'].move_ip(0 - b['rect'].left, b['speed'])
+                b['horizSpeed'] = -b['horizSpeed']
             else:
-                newBaddie = {'rect': pygame.Rect(random.randint(0, WINDOWWIDTH - baddieSize), 0 - baddieSize, baddieSize, baddieSize),
-                            'speed': random.randint(BADDIEMINSPEED, BADDIEMAXSPEED),
-                            'horizSpeed': 0,
-                            'surface':pygame.transform.scale(baddieImage, (baddieSize, baddieSize)),
-                            }
-
-            baddies.append(newBaddie)
-
-        # Move the player around.
-        if moveLeft and playerRect.left > 0:
-            playerRect.move_ip(-1 * PLAYERMOVERATE, 0)
-        if moveRight and playerRect.right < WINDOWWIDTH:
-            playerRect.move_ip(PLAYERMOVERATE, 0)
-        if moveUp and playerRect.top > 0:
-            playerRect.move_ip(0, -1 * PLAYERMOVERATE)
-        if moveDown and playerRect.bottom < WINDOWHEIGHT:
-            playerRect.move_ip(0, PLAYERMOVERATE)
-
-        # Move the baddies down.
-        for b in baddies:
-            if not reverseCheat and not slowCheat:
-                if(b['rect'].right + b['horizSpeed'] >= WINDOWWIDTH):
-                    b['rect'].move_ip(WINDOWWIDTH - b['rect'].right, b['speed'])
-                    b['horizSpeed'] = -b['horizSpeed']
-                elif(b['rect'].left + b['horizSpeed'] <= 0):
-                    b['rect'].move_ip(0 - b['rect'].left, b['speed'])
-                    b['horizSpeed'] = -b['horizSpeed']
-                else:
-                    b['rect'].move_ip(b['horizSpeed'], b['speed'])
-            elif reverseCheat:
-                b['rect'].move_ip(0, -5)
-            elif slowCheat:
-                b['rect'].move_ip(0, 1)
-
-        # Delete baddies that have fallen past the bottom.
-        for b in baddies[:]:
-            if b['rect'].top > WINDOWHEIGHT:
-                baddies.remove(b)
-
-        # Draw the game world on the window.
-        windowSurface.fill(BACKGROUNDCOLOR)
-
-        # Draw the score and top score.
-        drawText('Score: %s' % (score), font, windowSurface, 10, 0)
-        drawText('Top Score: %s' % (topScore), font, windowSurface, 10, 40)
-
-        # Draw the player's rectangle.
-        windowSurface.blit(playerImage, playerRect)
-
-        # Draw each baddie.
-        for b in baddies:
-            windowSurface.blit(b['surface'], b['rect'])
+                b['rect'].move_ip(b['horizSpeed'], b['speed'])
+        elif reverseCheat:
+            b['rect'].move_ip(0, -5)
+        elif slowCheat:
+            b['rect'].move_ip(0, 1)
 
-        pygame.display.update()
+    # Delete baddies that have fallen past the bottom.
+    for b in baddies[:]:
+        if b['rect'].top > WINDOWHEIGHT:
+            baddies.remove(b)
+    return baddieAddCounter
+
+def movePlayer(playerRect, moveLeft, moveRight, moveUp, moveDown):
+    if moveLeft and playerRect.left > 0:
+        playerRect.move_ip(-1 * PLAYERMOVERATE, 0)
+    if moveRight and playerRect.right < WINDOWWIDTH:
+        playerRect.move_ip(PLAYERMOVERATE, 0)
+    if moveUp and playerRect.top > 0:
+        playerRect.move_ip(0, -1 * PLAYERMOVERATE)
+    if moveDown and playerRect.bottom < WINDOWHEIGHT:
+        playerRect.move_ip(0, PLAYERMOVERATE)
+
+def drawBaddies(surface, baddies):
+    for b in baddies:
+        surface.blit(b['surface'], b['rect'])
 
-        # Check if any of the baddies have hit the player.
-        if playerHasHitBaddie(playerRect, baddies, invCheat):
-            if score > topScore:
-                topScore = score # set new top score
-            break
+def main():
+    # Set up pygame, the window, and the mouse cursor.
+    pygame.init()
+    mainClock = pygame.time.Clock()
+    windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    pygame.display.set_caption('Dodger')
+    pygame.mouse.set_visible(False)
 
-        mainClock.tick(FPS)
+    # Set up the fonts.
+    font = pygame.font.SysFont(None, 48)
 
-    # Stop the game and show the "Game Over" screen.
-    pygame.mixer.music.stop()
-    gameOverSound.play()
+    # Set up sounds.
+    gameOverSound = pygame.mixer.Sound('gameover.wav')
+    pygame.mixer.music.load('background.wav')
 
-    drawText('GAME OVER', font, windowSurface, (WINDOWWIDTH / 3), (WINDOWHEIGHT / 3))
-    drawText('Press a key to play again.', font, windowSurface, (WINDOWWIDTH / 3) - 80, (WINDOWHEIGHT / 3) + 50)
+    # Set up images.
+    playerImage = pygame.image.load('player.png')
+    playerRect = playerImage.get_rect()
+    baddieImage = pygame.image.load('baddie.png')
+
+    # Show the "Start" screen.
+    windowSurface.fill(BACKGROUNDCOLOR)
+    drawText('Dodger', font, windowSurface, (WINDOWWIDTH / 3), (WINDOWHEIGHT / 3))
+    drawText('Press a key to start.', font, windowSurface, (WINDOWWIDTH / 3) - 30, (WINDOWHEIGHT / 3) + 50)
     pygame.display.update()
     waitForPlayerToPressKey()
 
-    gameOverSound.stop()
+    topScore = 0
+    while True:
+        # Set up the start of the game.
+        baddies = []
+        score = 0
+        playerRect.topleft = (WINDOWWIDTH / 2, WINDOWHEIGHT - 50)
+        moveLeft = moveRight = moveUp = moveDown = False
+        reverseCheat = slowCheat = invCheat = False
+        baddieAddCounter = 0
+        pygame.mixer.music.play(-1, 0.0)
+
+        while True: # The game loop runs while the game part is playing.
+            score += 1 # Increase score.
+
+            PROFILER.begin(INPUT)
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    terminate()
+
+                if event.type == KEYDOWN:
+                    if event.key == K_z:
+                        reverseCheat = True
+                    if event.key == K_x:
+                        slowCheat = True
+                    if event.key == K_c:
+                        invCheat = True
+                    if event.key == K_LEFT or event.key == K_a:
+                        moveRight = False
+                        moveLeft = True
+                    if event.key == K_RIGHT or event.key == K_d:
+                        moveLeft = False
+                        moveRight = True
+                    if event.key == K_UP or event.key == K_w:
+                        moveDown = False
+                        moveUp = True
+                    if event.key == K_DOWN or event.key == K_s:
+                        moveUp = False
+                        moveDown = True
+
+                if event.type == KEYUP:
+                    if event.key == K_z:
+                        reverseCheat = False
+                        score = 0
+                    if event.key == K_x:
+                        slowCheat = False
+                        score = 0
+                    if event.key == K_c:
+                        invCheat = False
+                        score = 0
+                    if event.key == K_ESCAPE:
+                            terminate()
+
+                    if event.key == K_LEFT or event.key == K_a:
+                        moveLeft = False
+                    if event.key == K_RIGHT or event.key == K_d:
+                        moveRight = False
+                    if event.key == K_UP or event.key == K_w:
+                        moveUp = False
+                    if event.key == K_DOWN or event.key == K_s:
+                        moveDown = False
+
+                if event.type == MOUSEMOTION:
+                    # If the mouse moves, move the player where to the cursor.
+                    playerRect.centerx = event.pos[0]
+                    playerRect.centery = event.pos[1]
+            PROFILER.begin(UPDATE)
+            # Move the player and the baddies.
+            movePlayer(playerRect, moveLeft, moveRight, moveUp, moveDown)
+            baddieAddCounter = updateBaddies(baddies, baddieAddCounter, baddieImage, reverseCheat, slowCheat)
+
+            # Draw the game world on the window.
+            PROFILER.begin(DRAW)
+            windowSurface.fill(BACKGROUNDCOLOR)
+
+            # Draw the score and top score. The score goes up every frame, so
+            # it isn't worth keeping in the text cache.
+            drawText('Score: %s' % (score), font, windowSurface, 10, 0, cache=False)
+            drawText('Top Score: %s' % (topScore), font, windowSurface, 10, 40)
+
+            # Draw the player's rectangle.
+            windowSurface.blit(playerImage, playerRect)
+
+            # Draw each baddie.
+            drawBaddies(windowSurface, baddies)
+            PROFILER.end_phase()
+            PROFILER.draw(windowSurface)
+
+            PROFILER.begin(FLIP)
+            pygame.display.update()
+
+            # Check if any of the baddies have hit the player.
+            PROFILER.begin(COLLISION)
+            if playerHasHitBaddie(playerRect, baddies, invCheat):
+                if score > topScore:
+                    topScore = score # set new top score
+                break
+
+            PROFILER.end_phase()
+            mainClock.tick(FPS)
+            PROFILER.end_frame()
+
+        # Stop the game and show the "Game Over" screen.
+        PROFILER.end_frame()
+        pygame.mixer.music.stop()
+        gameOverSound.play()
+
+        drawText('GAME OVER', font, windowSurface, (WINDOWWIDTH / 3), (WINDOWHEIGHT / 3))
+        drawText('Press a key to play again.', font, windowSurface, (WINDOWWIDTH / 3) - 80, (WINDOWHEIGHT / 3) + 50)
+        pygame.display.update()
+        waitForPlayerToPressKey()
+
+        gameOverSound.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+# A Tetromino bot that searches every reachable drop position.
+#
+# For the falling piece, every rotation it can turn into and every column it
+# can slide to from where it is gets dropped onto the board's row masks and
+# scored with a weighted board heuristic (lines cleared, total column
+# height, covered holes and bumpiness). The board a placement leaves isn't
+# built to score it: only the heights of the columns the piece lands on
+# change, and holes (total height less filled cells) and bumpiness follow
+# from those. A placement that clears lines is scored from its whole board.
+# The best few are then looked at again with the next piece placed on top.
+#
+# The placements of a piece on a board are kept in a transposition cache
+# keyed by the row masks and the piece, so the ones the lookahead worked out
+# for the next piece are found again when that piece comes into play.
+
+from itertools import chain
+from operator import itemgetter
+from Board import rowsFit, columnHeights, dropDistance
+from Pieces import TEMPLATEWIDTH, SHAPES, ROTATIONS
+from Simulation import NOOP, LEFT, RIGHT, ROTATE, HARD_DROP, TetrisSimulation
+from homework.common.Rng import RandomService
+
+# heuristic weights, per line cleared / height unit / hole / bump
+LINES_WEIGHT = 0.76
+HEIGHT_WEIGHT = -0.51
+HOLES_WEIGHT = -0.36
+BUMPINESS_WEIGHT = -0.18
+
+# score of a placement that leaves part of the piece above the board
+TOPPED_OUT = -1e9
+
+
+def placeRows(rows, fullRow, shape, x, y):
+    # Lock a shape that has landed at (x, y) into a copy of rows. Returns the
+    # new rows and the number of lines cleared.
+    rows = rows[:]
+    for dy, mask, left, right in shape.rowMasks:
+        rows[y + dy] |= mask << x if x >= 0 else mask >> -x
+    kept = [row for row in rows if row != fullRow]
+    cleared = len(rows) - len(kept)
+    if cleared:
+        rows = [0] * cleared + kept
+    return rows, cleared
+
+
+def boardScore(totalHeight, holes, bumps):
+    # Weighted height, hole and bumpiness score of a board (higher is better).
+    return HEIGHT_WEIGHT * totalHeight + HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumps
+
+
+class SearchBoard:
+    # A board as the search sees it: the row masks, with the column heights,
+    # filled cell count and bumpiness its score is made of.
+    __slots__ = ('rows', 'width', 'fullRow', 'heights', 'totalHeight', 'filled', 'bumps', 'bumpsBefore',
+                 'nearlyFull')
+
+    def __init__(self, rows, width, heights=None, filled=None, nearlyFull=None):
+        # heights, filled and nearlyFull are worked out from rows unless given
+        self.rows = rows
+        self.width = width
+        self.fullRow = (1 << width) - 1
+        self.heights = heights = columnHeights(rows, width) if heights is None else heights
+        self.totalHeight = sum(heights)
+        # bumpsBefore[x]: the bumpiness of columns 0 to x
+        self.bumpsBefore = bumpsBefore = [0]
+        for x in range(width - 1):
+            bumpsBefore.append(bumpsBefore[-1] + abs(heights[x] - heights[x + 1]))
+        self.bumps = bumpsBefore[-1]
+        if filled is None or nearlyFull is None:
+            counts = list(map(int.bit_count, rows))
+            filled = sum(counts)
+            # bit y set for every row a piece could fill (no more than a
+            # template's width of cells missing)
+            nearlyFull = 0
+            for y, count in enumerate(counts):
+                if count >= width - TEMPLATEWIDTH:
+                    nearlyFull |= 1 << y
+        self.filled = filled
+        self.nearlyFull = nearlyFull
+
+    def score(self):
+        return boardScore(self.totalHeight, self.totalHeight - self.filled, self.bumps)
+
+    def place(self, shape, x, y):
+        # the SearchBoard left by shape landing at (x, y), and the lines cleared
+        rows, lines = placeRows(self.rows, self.fullRow, shape, x, y)
+        if lines:
+            return SearchBoard(rows, self.width), lines
+        # no rows moved, so only the piece's columns and rows changed
+        heights = self.heights[:]
+        top = len(rows) - y
+        for dx, dy in shape.columnTops:
+            if top - dy > heights[x + dx]:
+                heights[x + dx] = top - dy
+        nearlyFull = self.nearlyFull
+        for dy, mask, left, right in shape.rowMasks:
+            if rows[y + dy].bit_count() >= self.width - TEMPLATEWIDTH:
+                nearlyFull |= 1 << (y + dy)
+        return SearchBoard(rows, self.width, heights, self.filled + len(shape.offsets), nearlyFull), 0
+
+    def scorePlacements(self, shape, rotation, xs, y, results):
+        # Drop shape from (x, y) for every x in xs and append (score, lines
+        # cleared, rotation, x, the y it lands at) to results. A placement
+        # that doesn't clear lines is scored from the columns it lands on,
+        # without building the board it leaves.
+        rows = self.rows
+        width = self.width
+        heights = self.heights
+        floor = len(rows) - 1
+        fullRow = self.fullRow
+        nearlyFull = self.nearlyFull
+        totalHeight0 = self.totalHeight
+        filled = self.filled + len(shape.offsets)
+        bumps0 = self.bumps
+        bumpsBefore = self.bumpsBefore
+        columnBottoms = shape.columnBottoms
+        columnTops = shape.columnTops
+        rowMasks = shape.rowMasks
+        left = shape.left
+        right = shape.right
+        shapeTop = shape.top
+        span = (2 << (shape.bottom - shapeTop)) - 1
+        append = results.append
+        # A piece with a box in every column it spans that lands on top of
+        # them sets their heights to its own profile, so the bumps between
+        # its columns are its own and only the ones at its sides depend on
+        # the board. That covers most placements.
+        columns = len(columnTops)
+        profiled = columns == right - left + 1
+        ownHeight = columns - sum(dy for dx, dy in columnTops)
+        ownBumps = sum(abs(a[1] - b[1]) for a, b in zip(columnTops, columnTops[1:]))
+        topLeft = columnTops[0][1]
+        topRight = columnTops[-1][1]
+        for x in xs:
+            first = x + left
+            last = x + right
+            if profiled and first >= 0 and last < width:
+                lift = under = 0
+                for dx, bottom in columnBottoms:
+                    height = heights[x + dx]
+                    under += height
+                    if height + bottom > lift:
+                        lift = height + bottom
+                landed = floor - lift
+                if landed >= y and landed + shapeTop >= 0 and not nearlyFull >> (landed + shapeTop) & span:
+                    totalHeight = totalHeight0 + columns * lift + ownHeight - under
+                    base = lift + 1
+                    bumps = bumps0 + ownBumps
+                    if first:
+                        bumps += abs(heights[first - 1] - base + topLeft) - bumpsBefore[first] + bumpsBefore[first - 1]
+                    if last < width - 1:
+                        bumps += abs(base - topRight - heights[last + 1]) - bumpsBefore[last + 1] + bumpsBefore[last]
+                    bumps -= bumpsBefore[last] - bumpsBefore[first]
+                    append((HEIGHT_WEIGHT * totalHeight + HOLES_WEIGHT * (totalHeight - filled)
+                            + BUMPINESS_WEIGHT * bumps, 0, rotation, x, landed))
+                    continue
+
+            # the row it lands on, from the heights of the columns under it
+            # as long as it is above all of them (see Board.dropDistance)
+            landed = floor
+            for dx, bottom in columnBottoms:
+                column = x + dx
+                if 0 <= column < width:
+                    stop = floor - bottom - heights[column]
+                    if stop >= y:
+                        if stop < landed:
+                            landed = stop
+                        continue
+                landed = y + dropDistance(rows, width, heights, shape, x, y)
+                break
+            if landed + shapeTop < 0:
+                append((TOPPED_OUT, 0, rotation, x, landed))
+                continue
+            if nearlyFull >> (landed + shapeTop) & span:
+                for dy, mask, maskLeft, maskRight in rowMasks:
+                    if rows[landed + dy] | (mask << x if x >= 0 else mask >> -x) == fullRow:
+                        board, lines = self.place(shape, x, landed)
+                        append((LINES_WEIGHT * lines + board.score(), lines, rotation, x, landed))
+                        break
+                else:
+                    lines = 0
+                if lines:
+                    continue
+
+            # raise the piece's columns to its top boxes; the bumps between
+            # them and their neighbours are all that can change
+            low = x + left
+            if low > 0:
+                low -= 1
+            high = x + right
+            if high < width - 1:
+                high += 1
+            new = heights[low:high + 1]
+            totalHeight = totalHeight0
+            top = floor + 1 - landed
+            for dx, dy in columnTops:
+                column = x + dx - low
+                height = top - dy
+                if height > new[column]:
+                    totalHeight += height - new[column]
+                    new[column] = height
+            bumps = bumps0 - bumpsBefore[high] + bumpsBefore[low]
+            for i in range(high - low):
+                bumps += abs(new[i] - new[i + 1])
+            append((boardScore(totalHeight, totalHeight - filled, bumps), 0, rotation, x, landed))
+
+
+class TranspositionCache:
+    # Table of search results that keeps the recently used ones. Entries go
+    # into the current generation; once that holds half of maxSize it
+    # becomes the old generation and the one before is dropped. A hit in
+    # the old generation moves the entry back into the current one, so
+    # only entries unused for a whole generation are evicted. Counts its
+    # own hits and misses.
+
+    def __init__(self, maxSize):
+        self.generationSize = max(1, maxSize // 2)
+        self.current = {}
+        self.old = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.current) + len(self.old)
+
+    def get(self, key):
+        value = self.current.get(key)
+        if value is None:
+            value = self.old.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self.put(key, value)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.current[key] = value
+        if len(self.current) >= self.generationSize:
+            self.evictions += len(self.old)
+            self.old = self.current
+            self.current = {}
+
+    def clear(self):
+        self.current.clear()
+        self.old.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+class AIPlayer:
+
+    def __init__(self, lookahead=True, beam=4, cacheSize=4096):
+        self.lookahead = lookahead
+        self.beam = beam
+        self.cache = TranspositionCache(cacheSize)    # (row masks, piece, rotates) -> outcomes()
+        self.steered = None     # the last piece play() moved, left to land by itself
+
+    def clearCache(self):
+        self.cache.clear()
+
+    def cacheStats(self):
+        return self.cache.stats()
+
+    def placements(self, board, alignment, shape, rotation, x, y, rotates):
+        # Yield (rotation, Shape, xs) for every rotation the piece can turn
+        # into in place from (rotation, x, y) on a SearchBoard, where xs are
+        # the columns it can slide to from there: x, then leftwards, then
+        # rightwards.
+        rows = board.rows
+        width = board.width
+        stackTop = len(rows) - max(board.heights)   # rows above this are empty
+        count = ROTATIONS[alignment, shape]
+        for turns in range(count if rotates else 1):
+            r = (rotation + turns) % count
+            compiled = SHAPES[alignment, shape, r]
+            rowMasks = compiled.rowMasks
+            if y + compiled.bottom < stackTop and y + compiled.bottom >= 0:
+                # nothing on the board where the piece is, so only the walls
+                # stop it (rows above the board don't count)
+                left = -1 - min(maskLeft for dy, mask, maskLeft, maskRight in rowMasks if y + dy >= 0)
+                right = width - max(maskRight for dy, mask, maskLeft, maskRight in rowMasks if y + dy >= 0)
+                if not left < x < right:
+                    break
+            else:
+                if not rowsFit(rows, width, rowMasks, x, y):
+                    break  # can't turn any further from here
+                left = x - 1
+                while rowsFit(rows, width, rowMasks, left, y):
+                    left -= 1
+                right = x + 1
+                while rowsFit(rows, width, rowMasks, right, y):
+                    right += 1
+            yield r, compiled, chain(range(x, left, -1), range(x + 1, right))
+
+    def outcomes(self, board, piece, rotates):
+        # Return (score, lines, rotation, x, landing y) for every placement
+        # of piece on a SearchBoard, through the transposition cache.
+        key = (tuple(board.rows), piece['alignment'], piece['shape'], piece['rotation'],
+               piece['x'], piece['y'], rotates)
+        results = self.cache.get(key)
+        if results is None:
+            y = piece['y']
+            results = []
+            for r, compiled, xs in self.placements(board, piece['alignment'], piece['shape'],
+                                                   piece['rotation'], piece['x'], y, rotates):
+                board.scorePlacements(compiled, r, xs, y, results)
+            self.cache.put(key, results)
+        return results
+
+    def choosePlacement(self, game):
+        # Return the (rotation, x) to drop the falling piece at, or None if
+        # there is nowhere to put it.
+        piece = game.fallingPiece
+        board = SearchBoard(game.board.rows, game.board.width, game.board.heights)
+        results = self.outcomes(board, piece, game.canRotate())
+        if not results:
+            return None
+        results = sorted(results, key=itemgetter(0), reverse=True)
+
+        nextPiece = game.nextPiece
+        if self.lookahead and nextPiece is not None:
+            # the next piece's rotation lock is dealt with the piece after
+            # it, so it isn't known yet; plan as if it can turn
+            nextRotates = True
+            best = None
+            for score, lines, r, x, y in results[:self.beam]:
+                if score != TOPPED_OUT:
+                    after, lines = board.place(SHAPES[piece['alignment'], piece['shape'], r], x, y)
+                    nextResults = self.outcomes(after, nextPiece, nextRotates)
+                    score = LINES_WEIGHT * lines + (max(nextResults)[0] if nextResults else TOPPED_OUT)
+                if best is None or score > best[0]:
+                    best = (score, r, x)
+            return best[1], best[2]
+
+        score, lines, r, x, y = results[0]
+        return r, x
+
+    def planActions(self, game):
+        # Return the actions that take the falling piece to the chosen spot
+        # and hard drop it there.
+        placement = self.choosePlacement(game)
+        if placement is None:
+            return [HARD_DROP]
+        rotation, x = placement
+        piece = game.fallingPiece
+        turns = (rotation - piece['rotation']) % ROTATIONS[piece['alignment'], piece['shape']]
+        moves = x - piece['x']
+        return [ROTATE] * turns + [LEFT if moves < 0 else RIGHT] * abs(moves) + [HARD_DROP]
+
+    def play(self, game):
+        # Use as a TetrisSimulation policy: when a new piece comes into play,
+        # steer it straight to its spot and return the HARD_DROP that
+        # finishes the move, then wait for gravity to set it on the board.
+        game.spawn()
+        piece = game.fallingPiece
+        if piece is None or game.gameOver or piece is self.steered:
+            return NOOP
+        self.steered = piece
+        actions = self.planActions(game)
+        for action in actions[:-1]:
+            game.apply(action)
+        return actions[-1]
+
+
+def playGame(difficulty=0, maxPieces=1000, player=None, seed=None):
+    # Let the bot play one headless game and return the finished simulation.
+    player = player or AIPlayer()
+    game = TetrisSimulation(difficulty, rng=RandomService(seed))
+    while not game.gameOver and game.piecesPlaced < maxPieces:
+        game.step(player.play(game))
+    return game
@@ -0,0 +1,121 @@
+# Run many seeded, headless Tetromino games across processes.
+#
+# Every (difficulty, seed) pair is one game played by a simple policy on a
+# TetrisSimulation. Games are spread over a multiprocessing pool and each
+# result is written to a CSV file as soon as it comes back, so a long sweep
+# can be watched (or interrupted) while it runs.
+#
+#   python -m homework.Run 2/EvilOrNice/BatchRunner.py --games 1000 --sweep 5 --output sweep.csv
+
+import argparse, csv, multiprocessing, sys
+from Simulation import TetrisSimulation, ACTIONS, NOOP, HARD_DROP
+from homework.common.Rng import RandomService
+
+COLUMNS = ('difficulty', 'seed', 'policy', 'ticks', 'pieces', 'lines', 'level',
+           'evil_pieces', 'nice_pieces', 'rerolls_used', 'extra_chances_used', 'topped_out')
+
+
+# How often randomPolicy presses each of ACTIONS. Mostly waiting and
+# steering with the odd hard drop, so pieces spread over the board and a
+# game runs to a few dozen pieces instead of topping out almost at once.
+RANDOM_WEIGHTS = (40, 10, 10, 2, 8, 4, 1, 1)
+
+
+def randomPolicy(game):
+    # press a random key (or nothing) every tick
+    return game.rng.stream('policy').choices(ACTIONS, RANDOM_WEIGHTS)[0]
+
+
+def dropPolicy(game):
+    # never steer, just slam every piece straight down
+    return HARD_DROP
+
+
+def idlePolicy(game):
+    return NOOP
+
+
+_aiPlayer = None
+
+def aiPolicy(game):
+    # search bot, one per worker process so its cache carries across games
+    global _aiPlayer
+    if _aiPlayer is None:
+        from AIPlayer import AIPlayer
+        _aiPlayer = AIPlayer()
+    return _aiPlayer.play(game)
+
+
+POLICIES = {'random': randomPolicy, 'drop': dropPolicy, 'idle': idlePolicy, 'ai': aiPolicy}
+
+
+def playGame(difficulty, seed, policy='random', maxPieces=1000):
+    # Play one game to the end (or maxPieces) and return its result row.
+    choose = POLICIES[policy]
+    game = TetrisSimulation(difficulty, rng=RandomService(seed))
+    while not game.gameOver and game.piecesPlaced < maxPieces:
+        game.step(choose(game))
+    return {'difficulty': difficulty,
+            'seed': seed,
+            'policy': policy,
+            'ticks': game.ticks,
+            'pieces': game.piecesPlaced,
+            'lines': game.score,
+            'level': game.level,
+            'evil_pieces': game.evilPieces,
+            'nice_pieces': game.nicePieces,
+            'rerolls_used': game.rerollsUsed,
+            'extra_chances_used': game.extraChancesUsed,
+            'topped_out': int(game.gameOver)}
+
+
+def _playJob(job):
+    return playGame(*job)
+
+
+def makeJobs(difficulties, games, seed, policy, maxPieces):
+    # The same seeds are used at every difficulty so settings can be compared
+    # game for game.
+    for difficulty in difficulties:
+        for i in range(games):
+            yield (difficulty, seed + i, policy, maxPieces)
+
+
+def runBatch(jobs, output, processes=None, chunksize=16):
+    # Fan the jobs out over a pool and stream rows to output as they finish.
+    # Returns the number of games played.
+    writer = csv.DictWriter(output, fieldnames=COLUMNS)
+    writer.writeheader()
+    played = 0
+    with multiprocessing.Pool(processes) as pool:
+        for row in pool.imap_unordered(_playJob, jobs, chunksize):
+            writer.writerow(row)
+            played += 1
+    output.flush()
+    return played
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play seeded headless Tetromino games in parallel.')
+    parser.add_argument('--games', type=int, default=100, help='games per difficulty setting')
+    parser.add_argument('--difficulty', type=int, nargs='+', default=[0], help='difficulty settings to play')
+    parser.add_argument('--sweep', type=int, metavar='STEP', help='play every difficulty from 0 to 100 in steps of STEP')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game at each setting')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--max-pieces', type=int, default=1000, help='stop a game after this many pieces')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', default='-', help='CSV file to write (default: stdout)')
+    args = parser.parse_args(argv)
+
+    difficulties = list(range(0, 101, args.sweep)) if args.sweep else args.difficulty
+    jobs = makeJobs(difficulties, args.games, args.seed, args.policy, args.max_pieces)
+    if args.output == '-':
+        played = runBatch(jobs, sys.stdout, args.processes)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            played = runBatch(jobs, output, args.processes)
+    print('played %d games' % played, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
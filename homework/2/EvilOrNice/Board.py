@@ -0,0 +1,205 @@
+# Bitboard storage for the Tetromino board.
+#
+# Occupancy is kept as one integer mask per row (bit x is set when column x
+# is filled), so testing a piece against the board is a few ANDs and a full
+# row is a single equality test. The [color, alignment, shape] data of each
+# filled cell is stored separately as a one byte code per cell.
+
+import hashlib
+
+BLANK = '.'
+
+# Cell metadata is interned: code 0 is a blank cell, every other code indexes
+# a (color, alignment, shape) tuple in CELL_KINDS.
+CELL_KINDS = [BLANK]
+CELL_CODES = {}
+
+
+def cellCode(color, alignment, shape):
+    key = (color, alignment, shape)
+    code = CELL_CODES.get(key)
+    if code is None:
+        code = len(CELL_KINDS)
+        if code > 255:
+            raise ValueError('too many distinct cell kinds for a bitboard')
+        CELL_KINDS.append(key)
+        CELL_CODES[key] = code
+    return code
+
+
+def rowsFit(rows, width, rowMasks, x, y):
+    # rowMasks holds (dy, mask, left, right) for every non-empty row of a
+    # piece, where mask has bit dx set for each filled template column and
+    # left/right are the lowest and highest of those columns. Rows above the
+    # board are ignored, as they always have been. Works on any list of row
+    # masks, so searches can test placements on cheap copies of a board.
+    height = len(rows)
+    for dy, mask, left, right in rowMasks:
+        boardY = y + dy
+        if boardY < 0:
+            continue
+        if boardY >= height or x + left < 0 or x + right >= width:
+            return False
+        if rows[boardY] & (mask << x if x >= 0 else mask >> -x):
+            return False
+    return True
+
+
+def columnHeights(rows, width):
+    # Height of the stack in every column: the number of rows from the
+    # bottom of the board up to and including its highest filled cell.
+    height = len(rows)
+    heights = [0] * width
+    seen = 0
+    for y, row in enumerate(rows):
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= row
+    return heights
+
+
+def dropDistance(rows, width, heights, shape, x, y):
+    # How many rows a shape at (x, y) can fall before it lands. The first
+    # thing under each column of the piece is the top of the stack there, so
+    # the distance comes from the column heights and the piece's lowest box
+    # in each column, in O(piece width). A piece tucked under an overhang
+    # is below the top of some column, or one still above the board and
+    # outside the side walls; only then are the rows scanned.
+    limit = len(rows) - 1 - y
+    distance = limit
+    for dx, bottom in shape.columnBottoms:
+        if not 0 <= x + dx < width:
+            break
+        fall = limit - heights[x + dx] - bottom
+        if fall < 0:
+            break
+        if fall < distance:
+            distance = fall
+    else:
+        return distance
+    distance = 0
+    while rowsFit(rows, width, shape.rowMasks, x, y + distance + 1):
+        distance += 1
+    return distance
+
+
+class Board:
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fullRow = (1 << width) - 1
+        self.rows = [0] * height
+        self.cells = bytearray(width * height)
+        self.heights = [0] * width  # see columnHeights(), kept up to date
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.width = self.width
+        board.height = self.height
+        board.fullRow = self.fullRow
+        board.rows = self.rows[:]
+        board.cells = self.cells[:]
+        board.heights = self.heights[:]
+        return board
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, x):
+        # board[x][y] still reads and writes single cells, like the old
+        # list-of-columns board did.
+        if not 0 <= x < self.width:
+            raise IndexError('board column out of range')
+        return _Column(self, x)
+
+    def isOnBoard(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def isBlank(self, x, y):
+        return not (self.rows[y] >> x) & 1
+
+    def getCell(self, x, y):
+        # Return BLANK or the (color, alignment, shape) of a filled cell
+        return CELL_KINDS[self.cells[y * self.width + x]]
+
+    def setCell(self, x, y, value):
+        if value == BLANK:
+            self.clearCell(x, y)
+        else:
+            self.fillCell(x, y, cellCode(*value))
+
+    def fillCell(self, x, y, code):
+        self.rows[y] |= 1 << x
+        self.cells[y * self.width + x] = code
+        if self.height - y > self.heights[x]:
+            self.heights[x] = self.height - y
+
+    def clearCell(self, x, y):
+        self.rows[y] &= ~(1 << x)
+        self.cells[y * self.width + x] = 0
+        if self.height - y == self.heights[x]:
+            # the top of the column went; find the next filled cell down
+            bit = 1 << x
+            rows = self.rows
+            while y < self.height and not rows[y] & bit:
+                y += 1
+            self.heights[x] = self.height - y
+
+    def dropDistance(self, shape, x, y):
+        return dropDistance(self.rows, self.width, self.heights, shape, x, y)
+
+    def fits(self, rowMasks, x, y):
+        return rowsFit(self.rows, self.width, rowMasks, x, y)
+
+    def isCompleteRow(self, y):
+        return self.rows[y] == self.fullRow
+
+    def completeRows(self):
+        # indices of every full row, from the top of the board down
+        fullRow = self.fullRow
+        return [y for y, row in enumerate(self.rows) if row == fullRow]
+
+    def digest(self):
+        # Hash of the board contents. Cell codes depend on the order kinds
+        # were first seen in this process, so the kinds themselves are hashed.
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.width, self.height, self.rows)).encode())
+        h.update(repr([CELL_KINDS[code] for code in self.cells]).encode())
+        return h.digest()
+
+    def removeRows(self, ys):
+        # Remove the given rows and pull everything above them down, in one
+        # pass: the surviving rows are collected and the board rebuilt with
+        # blank rows on top.
+        if not ys:
+            return
+        width = self.width
+        removed = set(ys)
+        keep = [y for y in range(self.height) if y not in removed]
+        cleared = self.height - len(keep)
+        rows = self.rows
+        cells = self.cells
+        self.rows = [0] * cleared + [rows[y] for y in keep]
+        self.cells = bytearray(cleared * width) + b''.join([cells[y * width:(y + 1) * width] for y in keep])
+        self.heights = columnHeights(self.rows, width)
+
+
+class _Column:
+    __slots__ = ('board', 'x')
+
+    def __init__(self, board, x):
+        self.board = board
+        self.x = x
+
+    def __len__(self):
+        return self.board.height
+
+    def __getitem__(self, y):
+        return self.board.getCell(self.x, y)
+
+    def __setitem__(self, y, value):
+        self.board.setCell(self.x, y, value)
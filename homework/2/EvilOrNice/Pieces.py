@@ -0,0 +1,268 @@
+# Tetromino piece templates and the tables compiled from them.
+#
+# The 5x5 string templates below are what people edit. At import time every
+# rotation of every template is checked and compiled into a Shape holding its
+# filled (dx, dy) offsets, per-row bitmasks and bounding box, so the game
+# never scans a template while it is running.
+
+from collections import namedtuple
+from Board import BLANK
+
+FILLED = 'O'
+
+# Begin shape definitions
+# =======================
+TEMPLATEWIDTH = 5
+TEMPLATEHEIGHT = 5
+
+S_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '..OO.',
+                     '.OO..',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..OO.',
+                     '...O.',
+                     '.....']]
+
+Z_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '.OO..',
+                     '..OO.',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '.OO..',
+                     '.O...',
+                     '.....']]
+
+I_SHAPE_TEMPLATE = [['..O..',
+                     '..O..',
+                     '..O..',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     'OOOO.',
+                     '.....',
+                     '.....']]
+
+O_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '.OO..',
+                     '.OO..',
+                     '.....']]
+
+J_SHAPE_TEMPLATE = [['.....',
+                     '.O...',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..OO.',
+                     '..O..',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '...O.',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..O..',
+                     '.OO..',
+                     '.....']]
+
+L_SHAPE_TEMPLATE = [['.....',
+                     '...O.',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..O..',
+                     '..OO.',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '.O...',
+                     '.....'],
+                    ['.....',
+                     '.OO..',
+                     '..O..',
+                     '..O..',
+                     '.....']]
+
+T_SHAPE_TEMPLATE = [['.....',
+                     '..O..',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..OO.',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '.OO..',
+                     '..O..',
+                     '.....']]
+
+PIECES = {'S': S_SHAPE_TEMPLATE,
+          'Z': Z_SHAPE_TEMPLATE,
+          'J': J_SHAPE_TEMPLATE,
+          'L': L_SHAPE_TEMPLATE,
+          'I': I_SHAPE_TEMPLATE,
+          'O': O_SHAPE_TEMPLATE,
+          'T': T_SHAPE_TEMPLATE}
+
+SINGLE_TEMPLATE     = [['.....',
+                        '.....',
+                        '..O..',
+                        '.....',
+                        '.....']]
+
+V_TEMPLATE =          [['.....',
+                        '.O.O.',
+                        '..O..',
+                        '.....',
+                        '.....'],
+                       ['.....',
+                        '...O.',
+                        '..O..',
+                        '...O.',
+                        '.....'],
+                       ['.....',
+                        '.....',
+                        '..O..',
+                        '.O.O.',
+                        '.....'],
+                       ['.....',
+                        '.O...',
+                        '..O..',
+                        '.O...',
+                        '.....']]
+
+
+SEAN_TEMPLATE =       [['.....',
+                        '.O.O.',
+                        '..O..',
+                        '.O.O.',
+                        '.....']]
+
+EXTRA_CHANCE_TEMPLATE = [['.....',
+                          '.....',
+                          '..OO.',
+                          '.....',
+                          '.....'],
+                         ['.....',
+                          '.....',
+                          '..O..',
+                          '..O..',
+                          '.....'],
+                         ['.....',
+                          '.....',
+                          '.OO..',
+                          '.....',
+                          '.....'],
+                         ['.....',
+                          '..O..',
+                          '..O..',
+                          '.....',
+                          '.....']
+                         ]
+
+RE_ROLL_TEMPLATE =      [['.....',
+                          '.....',
+                          '.OOO.',
+                          '.....',
+                          '.....'],
+                         ['.....',
+                          '..O..',
+                          '..O..',
+                          '..O..',
+                          '.....']
+                         ]
+
+EVIL_PIECES = {"HM": SINGLE_TEMPLATE, "V": V_TEMPLATE, "SEAN": SEAN_TEMPLATE}
+EVIL_PIECE_COLOR_NUMBER = {"HM": 0, "V": 1, "SEAN": 2}
+
+NICE_PIECES = {"EC":EXTRA_CHANCE_TEMPLATE, "RR":RE_ROLL_TEMPLATE, "ONE": SINGLE_TEMPLATE}
+NICE_PIECE_COLOR_NUMBER = {"EC": 0, "RR": 1, "ONE":2}
+# =====================
+# End shape definitions
+
+PIECE_SETS = {"neutral": PIECES, "evil": EVIL_PIECES, "nice": NICE_PIECES}
+
+# offsets:  (dx, dy) of every filled box, in template row order
+# rowMasks: (dy, mask, left, right) of every non-empty row, as used by Board.fits
+# left, top, right, bottom: the bounding box of the filled boxes
+# columnBottoms: (dx, dy) of the lowest box in every filled column, as used by Board.dropDistance
+# columnTops: (dx, dy) of the highest box in every filled column, as used by AIPlayer
+Shape = namedtuple('Shape', 'offsets rowMasks left top right bottom columnBottoms columnTops')
+
+
+def compileShape(name, template):
+    # Check one rotation of a template and build its Shape.
+    if len(template) != TEMPLATEHEIGHT:
+        raise ValueError('%s: template must have %d rows, not %d' % (name, TEMPLATEHEIGHT, len(template)))
+    offsets = []
+    rowMasks = []
+    for dy, row in enumerate(template):
+        if len(row) != TEMPLATEWIDTH:
+            raise ValueError('%s: row %d must be %d characters wide: %r' % (name, dy, TEMPLATEWIDTH, row))
+        mask = 0
+        for dx, char in enumerate(row):
+            if char == FILLED:
+                offsets.append((dx, dy))
+                mask |= 1 << dx
+            elif char != BLANK:
+                raise ValueError('%s: row %d has %r, expected %r or %r: %r' % (name, dy, char, BLANK, FILLED, row))
+        if mask:
+            rowMasks.append((dy, mask, (mask & -mask).bit_length() - 1, mask.bit_length() - 1))
+    if not offsets:
+        raise ValueError('%s: template has no filled boxes' % name)
+    xs = [dx for dx, dy in offsets]
+    ys = [dy for dx, dy in offsets]
+    bottoms = {}
+    tops = {}
+    for dx, dy in offsets:
+        bottoms[dx] = max(dy, bottoms.get(dx, dy))
+        tops[dx] = min(dy, tops.get(dx, dy))
+    return Shape(tuple(offsets), tuple(rowMasks), min(xs), min(ys), max(xs), max(ys),
+                 tuple(sorted(bottoms.items())), tuple(sorted(tops.items())))
+
+
+def compilePieces():
+    # Compile every rotation of every piece set, keyed by (alignment, shape, rotation).
+    shapes = {}
+    rotations = {}
+    for alignment, pieces in PIECE_SETS.items():
+        for shape, templates in pieces.items():
+            if not templates:
+                raise ValueError('%s %s: piece has no rotations' % (alignment, shape))
+            rotations[alignment, shape] = len(templates)
+            for rotation, template in enumerate(templates):
+                name = '%s %s rotation %d' % (alignment, shape, rotation)
+                shapes[alignment, shape, rotation] = compileShape(name, template)
+    return shapes, rotations
+
+
+SHAPES, ROTATIONS = compilePieces()
+
+
+def getShape(piece):
+    return SHAPES[piece['alignment'], piece['shape'], piece['rotation']]
+
+
+def getRotationCount(piece):
+    return ROTATIONS[piece['alignment'], piece['shape']]
@@ -0,0 +1,177 @@
+# Record Tetromino games to a compact binary log and replay them headless.
+#
+# A log starts with a header holding the difficulty, board size and the seed
+# of the game's RandomService, followed by one fixed-size event per call
+# that changed the game (spawn, action, fall) and per random draw (every
+# piece dealt, every cell the hole maker cleared), each tagged with the tick
+# it happened on. A finished game ends with an END event and a digest of
+# the final board.
+#
+# Replaying feeds the spawn/action/fall events into a fresh simulation with
+# the same seed while recording it again. The new log has to match the old
+# one byte for byte, so the first differing event pins down the tick where a
+# change in the rules made a game go differently.
+#
+# Tetris.py records its games when GAMES_REPLAYS names a directory:
+#
+#   GAMES_REPLAYS=replays python -m homework.Run 2/EvilOrNice/Tetris.py
+#   python -m homework.Run 2/EvilOrNice/Replay.py 'replays/*.trpl'
+#
+# Patterns among the logs are expanded here, so they can be given relative
+# to this directory.
+
+import argparse, glob, io, multiprocessing, struct, sys
+from Pieces import ROTATIONS
+from Simulation import TetrisSimulation
+from homework.common.Rng import RandomService
+
+MAGIC = b'TRPL'
+VERSION = 2
+
+# magic, version, difficulty, board width, board height, seed
+HEADER = struct.Struct('<4sBBHHQ')
+# tick, event kind, four arguments (board coordinates, piece fields, ...)
+EVENT = struct.Struct('<IBhhhh')
+
+SPAWN = 0
+ACTION = 1     # action
+FALL = 2
+PIECE = 3      # piece kind, rotation, color, rotation lock
+HOLE = 4       # x, y
+END = 5
+
+# every (alignment, shape) a piece can have, numbered for the log
+PIECE_KINDS = sorted(ROTATIONS)
+PIECE_KIND_NUMBERS = {kind: number for number, kind in enumerate(PIECE_KINDS)}
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Recorder:
+
+    def __init__(self, output):
+        # output is a binary file (or anything with write())
+        self.output = output
+        self.events = 0
+
+    def start(self, game):
+        # Write the header and the two pieces dealt when the game was made,
+        # then attach to the game to log the rest.
+        self.output.write(HEADER.pack(MAGIC, VERSION, game.difficulty, game.board.width,
+                                      game.board.height, game.rng.seed))
+        self.piece(game.ticks, game.fallingPiece)
+        self.piece(game.ticks, game.nextPiece)
+        game.recorder = self
+
+    def event(self, tick, kind, a=0, b=0, c=0, d=0):
+        self.output.write(EVENT.pack(tick, kind, a, b, c, d))
+        self.events += 1
+
+    def spawn(self, tick):
+        self.event(tick, SPAWN)
+
+    def action(self, tick, action):
+        self.event(tick, ACTION, action)
+
+    def fall(self, tick):
+        self.event(tick, FALL)
+
+    def piece(self, tick, piece):
+        kind = PIECE_KIND_NUMBERS[piece['alignment'], piece['shape']]
+        self.event(tick, PIECE, kind, piece['rotation'], piece['color'], piece['stopRotation'])
+
+    def hole(self, tick, x, y):
+        self.event(tick, HOLE, x, y)
+
+    def finish(self, game):
+        # End the log with the final board so a replay can be checked
+        # against it, and detach from the game.
+        self.event(game.ticks, END)
+        self.output.write(game.board.digest())
+        self.output.flush()
+        game.recorder = None
+
+
+def readHeader(data):
+    magic, version, difficulty, width, height, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ReplayError('not a version %d replay log' % VERSION)
+    return difficulty, width, height, seed
+
+
+def replay(data):
+    # Re-run a recorded game and return the finished simulation. Raises
+    # ReplayError if anything, down to a single random draw, comes out
+    # differently, or if the final board does not match.
+    difficulty, width, height, seed = readHeader(data)
+    game = TetrisSimulation(difficulty, width, height, rng=RandomService(seed))
+    output = io.BytesIO()
+    Recorder(output).start(game)
+
+    end = None
+    for offset in range(HEADER.size, len(data) - EVENT.size + 1, EVENT.size):
+        tick, kind, a, b, c, d = EVENT.unpack_from(data, offset)
+        game.ticks = tick
+        if kind == SPAWN:
+            game.spawn()
+        elif kind == ACTION:
+            game.apply(a)
+        elif kind == FALL:
+            game.fall()
+        elif kind == END:
+            end = offset + EVENT.size
+            game.recorder.finish(game)
+            break
+    if end is None:
+        # the game was cut short (the window was closed), so there is no
+        # final board to check; just compare the events there are
+        end = len(data) - (len(data) - HEADER.size) % EVENT.size
+        data = data[:end]
+
+    replayed = output.getvalue()
+    if replayed == data:
+        return game
+    for offset in range(HEADER.size, min(end, len(replayed)) - EVENT.size + 1, EVENT.size):
+        if replayed[offset:offset + EVENT.size] != data[offset:offset + EVENT.size]:
+            tick = EVENT.unpack_from(data, offset)[0]
+            raise ReplayError('game diverged at tick %d (event %d)'
+                              % (tick, (offset - HEADER.size) // EVENT.size))
+    if len(replayed) != len(data):
+        raise ReplayError('game ended differently after tick %d' % game.ticks)
+    raise ReplayError('final board differs')
+
+
+def checkFile(path):
+    # Replay one log file; returns (path, error message or None, ticks).
+    with open(path, 'rb') as log:
+        data = log.read()
+    try:
+        game = replay(data)
+    except (ReplayError, struct.error, ValueError) as error:
+        return path, str(error), 0
+    return path, None, game.ticks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded Tetromino games and check they still play out the same.')
+    parser.add_argument('logs', nargs='+', help='replay logs to check')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+    logs = [path for pattern in args.logs for path in sorted(glob.glob(pattern)) or [pattern]]
+
+    failed = 0
+    with multiprocessing.Pool(args.processes) as pool:
+        for path, error, ticks in pool.imap_unordered(checkFile, logs):
+            if error is None:
+                print('ok    %s (%d ticks)' % (path, ticks))
+            else:
+                failed += 1
+                print('FAIL  %s: %s' % (path, error))
+    print('%d of %d replays failed' % (failed, len(logs)), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# Fixed-timestep scheduling for the Tetromino game loop.
+#
+# Game logic advances in whole ticks of 1/TICKRATE seconds. Every timed
+# rule (gravity, auto-repeat while a key is held, soft drop) is a TickTimer
+# that counts those ticks, so the game plays out the same whatever the
+# frame rate is, and a run with no clock at all plays out the same as one
+# in real time.
+#
+# FixedStepClock decides how many ticks are due on each pass of the loop.
+# Throttled, it measures real time once per frame and keeps the leftover
+# fraction of a tick in an accumulator for the next frame. Unthrottled, one
+# tick is due on every pass and nothing ever sleeps, for simulation runs.
+
+import time
+
+TICKRATE = 60       # logic ticks per second
+MAXCATCHUP = 10     # most ticks run in one frame after a stall
+
+
+def ticksFor(seconds, rate=TICKRATE):
+    # whole ticks in a period given in seconds (always at least one)
+    return max(1, int(round(seconds * rate)))
+
+
+class TickTimer:
+    __slots__ = ('period', 'elapsed')
+
+    def __init__(self, period):
+        self.period = period
+        self.elapsed = 0
+
+    def reset(self, period=None):
+        # start counting again, optionally with a new period
+        if period is not None:
+            self.period = period
+        self.elapsed = 0
+
+    def advance(self):
+        # count one tick; returns True once a full period has passed
+        self.elapsed += 1
+        return self.elapsed >= self.period
+
+
+class FixedStepClock:
+
+    def __init__(self, rate=TICKRATE, throttled=True, timer=time.perf_counter):
+        self.step = 1.0 / rate
+        self.throttled = throttled
+        self.timer = timer
+        self.accumulator = 0.0
+        self.last = None
+        self.nextFrame = None
+
+    def reset(self):
+        # forget the time spent away from the game (a pause screen)
+        self.accumulator = 0.0
+        self.last = None
+        self.nextFrame = None
+
+    def ticksDue(self):
+        # How many logic ticks to run on this pass of the loop.
+        if not self.throttled:
+            return 1
+        now = self.timer()
+        if self.last is None:
+            self.last = now
+        self.accumulator += now - self.last
+        self.last = now
+        due = int(self.accumulator / self.step)
+        if due > MAXCATCHUP:
+            # fell too far behind to catch up; drop the backlog
+            self.accumulator = 0.0
+            return MAXCATCHUP
+        self.accumulator -= due * self.step
+        return due
+
+    def waitForFrame(self, fps):
+        # Sleep until the next frame is due at fps frames per second.
+        if not self.throttled:
+            return
+        now = self.timer()
+        if self.nextFrame is None or now - self.nextFrame > 1.0 / fps:
+            self.nextFrame = now
+        self.nextFrame += 1.0 / fps
+        if self.nextFrame > now:
+            time.sleep(self.nextFrame - now)
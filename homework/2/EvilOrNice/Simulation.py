@@ -0,0 +1,328 @@
+# The Tetromino rules, with no display, clock or input attached.
+#
+# TetrisSimulation holds everything one game needs and advances it one tick
+# at a time from abstract actions. Tetris.py turns key presses into these
+# actions; batch runs and bots call step() directly. Gravity is the same
+# for both: the piece falls a row each time the fall timer runs out, at the
+# speed of the level it came into play on (see gravity()).
+
+import random
+from collections import deque
+from Board import Board
+from Scheduler import TickTimer, ticksFor
+from Pieces import (TEMPLATEWIDTH, PIECES, EVIL_PIECES, NICE_PIECES,
+                    EVIL_PIECE_COLOR_NUMBER, NICE_PIECE_COLOR_NUMBER, SINGLE_TEMPLATE,
+                    getShape, getRotationCount)
+
+from homework.common.Rng import RNG, PIECES as PIECE_STREAM, HOLES as HOLE_STREAM
+
+BOARDWIDTH = 14
+BOARDHEIGHT = 20
+DIFFICULTY_MAX = 99
+NEUTRAL_COLOR_COUNT = 4
+
+# pieces are drawn from the piece stream this many at a time
+PIECE_BATCH = 256
+
+NEUTRAL_SHAPES = tuple(PIECES)
+EVIL_SHAPES = tuple(EVIL_PIECES)
+NICE_SHAPES = tuple(NICE_PIECES)
+
+# Actions understood by TetrisSimulation.apply() and step()
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+DOWN = 3
+ROTATE = 4
+ROTATE_BACK = 5
+HARD_DROP = 6
+REROLL = 7
+ACTIONS = (NOOP, LEFT, RIGHT, DOWN, ROTATE, ROTATE_BACK, HARD_DROP, REROLL)
+
+
+def calculateLevelAndFallFreq(score):
+    # Based on the score, return the level the player is on and
+    # how many seconds pass until a falling piece falls one space.
+    level = int(score / 10) + 1
+    fallFreq = 0.27 - (level * 0.02)
+    return level, fallFreq
+
+
+def getNewPieces(count, difficulty=0, boardWidth=BOARDWIDTH, rng=random):
+    # return count random new pieces, each in a random rotation and color.
+    # All the random numbers are drawn up front, five per piece.
+    draws = [rng.random() for _ in range(5 * count)]
+    x = int(boardWidth / 2) - int(TEMPLATEWIDTH / 2)
+    newPieces = []
+    for i in range(0, 5 * count, 5):
+        piece_type, stopRotation, a, b, c = draws[i:i + 5]
+        if(int(piece_type * 4) == 3):
+            good_or_bad = int(a * (DIFFICULTY_MAX + 1))
+            if(good_or_bad < difficulty):
+                shape = EVIL_SHAPES[int(b * len(EVIL_SHAPES))]
+                newPiece = {'shape': shape,
+                            'rotation': int(c * len(SINGLE_TEMPLATE)),
+                            'color': EVIL_PIECE_COLOR_NUMBER[shape],
+                            'alignment': "evil"}
+            else:
+                shape = NICE_SHAPES[int(b * len(NICE_SHAPES))]
+                newPiece = {'shape': shape,
+                            'rotation': int(c * len(SINGLE_TEMPLATE)),
+                            'color': NICE_PIECE_COLOR_NUMBER[shape],
+                            'alignment': "nice"}
+        else:
+            shape = NEUTRAL_SHAPES[int(a * len(NEUTRAL_SHAPES))]
+            newPiece = {'shape': shape,
+                        'rotation': int(b * len(PIECES[shape])),
+                        'color': int(c * NEUTRAL_COLOR_COUNT),
+                        'alignment': "neutral"}
+        newPiece['x'] = x
+        newPiece['y'] = -2  # start it above the board (i.e. less than 0)
+        # locking rotation of pieces chance after certain difficulty is selected
+        newPiece['stopRotation'] = int(stopRotation * 4)
+        newPieces.append(newPiece)
+    return newPieces
+
+
+def getNewPiece(difficulty=0, boardWidth=BOARDWIDTH, rng=random):
+    # return a random new piece in a random rotation and color
+    return getNewPieces(1, difficulty, boardWidth, rng)[0]
+
+
+def getBlankBoard(width=BOARDWIDTH, height=BOARDHEIGHT):
+    # create and return a new blank board data structure
+    return Board(width, height)
+
+
+def addToBoard(board, piece):
+    # fill in the board based on piece's location, shape, and rotation
+    value = (piece['color'], piece['alignment'], piece['shape'])
+    for dx, dy in getShape(piece).offsets:
+        x = dx + piece['x']
+        y = dy + piece['y']
+        if 0 <= y < board.height and 0 <= x < board.width:
+            board.setCell(x, y, value)
+
+
+def isValidPosition(board, piece, adjX=0, adjY=0):
+    # Return True if the piece is within the board and not colliding
+    return board.fits(getShape(piece).rowMasks, piece['x'] + adjX, piece['y'] + adjY)
+
+
+def isCompleteLine(board, y, game=None):
+    # Return True if the line filled with boxes with no gaps.
+    if not board.isCompleteRow(y):
+        return False
+    if game is not None:
+        giveSpecialBonuses(board, y, game)
+    return True
+
+
+def giveSpecialBonuses(board, y, game):
+    # Check if there is an extra chance or re-roll block in a completed row
+    for x in range(board.width):
+        shape = board.getCell(x, y)[2]
+        if shape == "EC":
+            game.extraChance = True
+        if shape == "RR":
+            game.rerolls += 1
+
+
+def removeCompleteLines(board, game=None):
+    # Remove any completed lines on the board and move everything above them
+    # down, all in one pass. Returns the indices of the removed rows (from the
+    # top of the board down, as they were before removal) so renderers can
+    # animate them; len() of it is the number of lines cleared.
+    cleared = board.completeRows()
+    if game is not None:
+        for y in cleared:
+            giveSpecialBonuses(board, y, game)
+    board.removeRows(cleared)
+    return cleared
+
+
+def holeMaker(piece, board, rng=random):
+    # Clear a random cell below the piece. Returns the (x, y) cleared, if any.
+    if(piece['y'] < board.height - 3):
+        to_delete = rng.randint(piece['y'] + 3, board.height - 1)
+        board.clearCell(piece['x'] + 2, to_delete)
+        return piece['x'] + 2, to_delete
+    return None
+
+
+class TetrisSimulation:
+
+    def __init__(self, difficulty=0, width=BOARDWIDTH, height=BOARDHEIGHT, rng=None):
+        # rng is the RandomService to draw from; the process-wide one by default
+        self.difficulty = difficulty
+        self.rng = RNG if rng is None else rng
+        self.pieceStream = self.rng.stream(PIECE_STREAM)
+        self.holeStream = self.rng.stream(HOLE_STREAM)
+        self.pieceQueue = deque()
+        self.board = getBlankBoard(width, height)
+        self.score = 0
+        self.level, self.fallFreq = calculateLevelAndFallFreq(self.score)
+        self.fallTimer = TickTimer(ticksFor(self.fallFreq))
+        self.extraChance = False
+        self.rerolls = 0
+        # The rotation lock, as in the original game, is that of the piece
+        # dealt last, which is usually the next piece rather than the one
+        # falling (see newPiece).
+        self.stopRotation = 0
+        self.gameOver = False
+        self.ticks = 0
+        self.clearedRows = []   # rows removed by the last piece to land
+        self.recorder = None    # a Replay.Recorder logging calls and random draws
+
+        # running totals for batch statistics; pieces count once they are in play
+        self.piecesPlaced = 0
+        self.evilPieces = 0
+        self.nicePieces = 0
+        self.rerollsUsed = 0
+        self.extraChancesUsed = 0
+
+        self.fallingPiece = self.newPiece()
+        self.nextPiece = self.newPiece()
+        self.countPiece(self.fallingPiece)
+
+    def newPiece(self):
+        if not self.pieceQueue:
+            self.pieceQueue.extend(getNewPieces(PIECE_BATCH, self.difficulty, self.board.width, self.pieceStream))
+        piece = self.pieceQueue.popleft()
+        if self.recorder is not None:
+            self.recorder.piece(self.ticks, piece)
+        self.stopRotation = piece['stopRotation']
+        return piece
+
+    def countPiece(self, piece):
+        if piece['alignment'] == "evil":
+            self.evilPieces += 1
+        elif piece['alignment'] == "nice":
+            self.nicePieces += 1
+
+    def canRotate(self):
+        # whether the rotation lock lets the falling piece turn
+        return not (self.stopRotation == 3 and self.difficulty >= 75)
+
+    def spawn(self):
+        # Start the next piece at the top if nothing is falling. Returns True
+        # when a new piece was brought into play.
+        if self.fallingPiece is not None or self.gameOver:
+            return False
+        if self.recorder is not None:
+            self.recorder.spawn(self.ticks)
+        self.fallingPiece = self.nextPiece
+        self.nextPiece = self.newPiece()
+        self.countPiece(self.fallingPiece)
+        self.fallTimer.reset(ticksFor(self.fallFreq))
+
+        if not isValidPosition(self.board, self.fallingPiece):
+            if self.extraChance:
+                self.board = getBlankBoard(self.board.width, self.board.height)
+                self.extraChance = False
+                self.extraChancesUsed += 1
+            else:
+                self.gameOver = True  # can't fit a new piece on the board
+        return True
+
+    def apply(self, action):
+        # Apply one player action to the falling piece. Returns True if the
+        # action changed anything.
+        piece = self.fallingPiece
+        if piece is None or self.gameOver or action == NOOP:
+            return False
+        if self.recorder is not None:
+            self.recorder.action(self.ticks, action)
+        board = self.board
+
+        if action == LEFT or action == RIGHT:
+            adjX = -1 if action == LEFT else 1
+            if isValidPosition(board, piece, adjX=adjX):
+                piece['x'] += adjX
+                return True
+            return False
+
+        elif action == DOWN:
+            if isValidPosition(board, piece, adjY=1):
+                piece['y'] += 1
+                return True
+            return False
+
+        elif action == ROTATE or action == ROTATE_BACK:
+            # no rotation of a piece
+            if not self.canRotate():
+                return False
+            rotations = getRotationCount(piece)
+            turn = 1 if action == ROTATE else -1
+            piece['rotation'] = (piece['rotation'] + turn) % rotations
+            if not isValidPosition(board, piece):
+                piece['rotation'] = (piece['rotation'] - turn) % rotations
+                return False
+            return True
+
+        elif action == HARD_DROP:
+            # move the current piece all the way down
+            dropped = self.dropDistance()
+            piece['y'] += dropped
+            return dropped > 0
+
+        elif action == REROLL:
+            if self.rerolls <= 0:
+                return False
+            self.fallingPiece = self.newPiece()
+            self.countPiece(self.fallingPiece)
+            self.rerolls -= 1
+            self.rerollsUsed += 1
+            return True
+
+        raise ValueError('unknown action %r' % (action,))
+
+    def dropDistance(self):
+        # rows the falling piece can still fall (where a hard drop puts it)
+        piece = self.fallingPiece
+        if piece is None:
+            return 0
+        return self.board.dropDistance(getShape(piece), piece['x'], piece['y'])
+
+    def fall(self):
+        # Let the falling piece fall one row, or lock it into the board if it
+        # has landed. Returns True if the piece moved down.
+        piece = self.fallingPiece
+        if piece is None or self.gameOver:
+            return False
+        if self.recorder is not None:
+            self.recorder.fall(self.ticks)
+        if isValidPosition(self.board, piece, adjY=1):
+            piece['y'] += 1
+            return True
+
+        # falling piece has landed, set it on the board
+        addToBoard(self.board, piece)
+        self.piecesPlaced += 1
+        self.clearedRows = removeCompleteLines(self.board, self)
+        self.score += len(self.clearedRows)
+        self.level, self.fallFreq = calculateLevelAndFallFreq(self.score)
+        if(piece["shape"] == "HM"):
+            hole = holeMaker(piece, self.board, self.holeStream)
+            if hole is not None and self.recorder is not None:
+                self.recorder.hole(self.ticks, *hole)
+        self.fallingPiece = None
+        return False
+
+    def gravity(self):
+        # Count one tick of the fall timer; when it runs out the piece falls
+        # a row, or lands. Returns True if the piece moved down.
+        if self.fallTimer.advance() and self.fall():
+            self.fallTimer.reset()
+            return True
+        return False
+
+    def step(self, action=NOOP):
+        # Advance the game by one tick, as Tetris.py's loop does: bring in a
+        # new piece if needed, apply the action, then let gravity act.
+        self.spawn()
+        if self.gameOver:
+            return
+        self.apply(action)
+        self.gravity()
+        self.ticks += 1
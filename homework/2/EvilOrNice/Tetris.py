@@ -3,28 +3,36 @@
 # http://inventwithpython.com/pygame
 # Released under a "Simplified BSD" license
 
-import random, time, pygame, sys, tkinter
+import random, time, pygame, sys, os, tkinter
 from pygame.locals import *
 
+from homework.common.TextCache import render_text
+from homework.common.Rng import RNG, RandomService, GAMES
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, DRAW, FLIP
+from Pieces import TEMPLATEWIDTH, TEMPLATEHEIGHT, getShape
+from Simulation import (TetrisSimulation, BOARDWIDTH, BOARDHEIGHT, NEUTRAL_COLOR_COUNT,
+                        LEFT, RIGHT, DOWN, ROTATE, ROTATE_BACK, HARD_DROP, REROLL)
+from Replay import Recorder
+from Scheduler import FixedStepClock, TickTimer, ticksFor
+
 FPS = 25
 WINDOWWIDTH = 640
 WINDOWHEIGHT = 480
 BOXSIZE = 20
-BOARDWIDTH = 14
-BOARDHEIGHT = 20
 BLANK = '.'
 DIFFICULTY = 0
-DIFFICULTY_MAX = 99
-
-EXTRA_CHANCE = False
-REROLLS = 0
-
-# locking rotation of pieces chance after certain difficulty is selected
-STOPROTATION = 0
 
 MOVESIDEWAYSFREQ = 0.15
 MOVEDOWNFREQ = 0.1
 
+THROTTLED = True    # False runs the game logic as fast as it can go
+RENDER = True       # False plays without drawing anything
+
+# Setting GAMES_REPLAYS to a directory records every game there (check them
+# with Replay.py); only the newest REPLAYKEEP recordings are kept.
+REPLAYDIR = os.environ.get('GAMES_REPLAYS')
+REPLAYKEEP = 50
+
 XMARGIN = int((WINDOWWIDTH - BOARDWIDTH * BOXSIZE) / 2)
 TOPMARGIN = WINDOWHEIGHT - (BOARDHEIGHT * BOXSIZE) - 5
 
@@ -68,199 +76,10 @@ NICE_LIGHT_COLORS = (LIGHTBROWN, LIGHTVIOLET, LIGHT_INDIAN_RED)
 
 
 assert len(COLORS) == len(LIGHTCOLORS) # each color must have light color
+assert len(COLORS) == NEUTRAL_COLOR_COUNT # each neutral piece color must be drawable
 # =====================
 # End color definitions
 
-# Begin shape definitions
-# =======================
-TEMPLATEWIDTH = 5
-TEMPLATEHEIGHT = 5
-
-S_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '..OO.',
-                     '.OO..',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..OO.',
-                     '...O.',
-                     '.....']]
-
-Z_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '.OO..',
-                     '..OO.',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '.OO..',
-                     '.O...',
-                     '.....']]
-
-I_SHAPE_TEMPLATE = [['..O..',
-                     '..O..',
-                     '..O..',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     'OOOO.',
-                     '.....',
-                     '.....']]
-
-O_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '.OO..',
-                     '.OO..',
-                     '.....']]
-
-J_SHAPE_TEMPLATE = [['.....',
-                     '.O...',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..OO.',
-                     '..O..',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '...O.',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..O..',
-                     '.OO..',
-                     '.....']]
-
-L_SHAPE_TEMPLATE = [['.....',
-                     '...O.',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..O..',
-                     '..OO.',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '.O...',
-                     '.....'],
-                    ['.....',
-                     '.OO..',
-                     '..O..',
-                     '..O..',
-                     '.....']]
-
-T_SHAPE_TEMPLATE = [['.....',
-                     '..O..',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..OO.',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '.OO..',
-                     '..O..',
-                     '.....']]
-
-PIECES = {'S': S_SHAPE_TEMPLATE,
-          'Z': Z_SHAPE_TEMPLATE,
-          'J': J_SHAPE_TEMPLATE,
-          'L': L_SHAPE_TEMPLATE,
-          'I': I_SHAPE_TEMPLATE,
-          'O': O_SHAPE_TEMPLATE,
-          'T': T_SHAPE_TEMPLATE}
-
-SINGLE_TEMPLATE     = [['.....',
-                        '.....',
-                        '..O..',
-                        '.....',
-                        '.....']]
-
-V_TEMPLATE =          [['.....',
-                        '.0.0.',
-                        '..O..',
-                        '.....',
-                        '.....'],
-                       ['.....',
-                        '...0.',
-                        '..O..',
-                        '...0.',
-                        '.....'],
-                       ['.....',
-                        '.....',
-                        '..O..',
-                        '.0.0.',
-                        '.....'],
-                       ['.....',
-                        '.0...',
-                        '..O..',
-                        '.0...',
-                        '.....']]
-
-
-SEAN_TEMPLATE =       [['.....',
-                        '.0.0.',
-                        '..O..',
-                        '.0.0.',
-                        '.....']]
-
-EXTRA_CHANCE_TEMPLATE = [['.....',
-                          '.....',
-                          '..OO.',
-                          '.....',
-                          '.....'],
-                         ['.....',
-                          '.....',
-                          '..O..',
-                          '..O..',
-                          '.....'],
-                         ['.....',
-                          '.....',
-                          '.OO..',
-                          '.....',
-                          '.....'],
-                         ['.....',
-                          '..O..',
-                          '..O..',
-                          '.....',
-                          '.....']
-                         ]
-
-RE_ROLL_TEMPLATE =      [['.....',
-                          '.....',
-                          '.OOO.',
-                          '.....',
-                          '.....'],
-                         ['.....',
-                          '..O..',
-                          '..O..',
-                          '..O..',
-                          '.....']
-                         ]
-
-EVIL_PIECES = {"HM": SINGLE_TEMPLATE, "V": V_TEMPLATE, "SEAN": SEAN_TEMPLATE}
-EVIL_PIECE_COLOR_NUMBER = {"HM": 0, "V": 1, "SEAN": 2}
-
-NICE_PIECES = {"EC":EXTRA_CHANCE_TEMPLATE, "RR":RE_ROLL_TEMPLATE, "ONE": SINGLE_TEMPLATE}
-NICE_PIECE_COLOR_NUMBER = {"EC": 0, "RR": 1, "ONE":2}
-# =====================
-# End shape definitions
 
 difficulty = tkinter.Tk()
 difficulty.geometry("400x150")
@@ -302,6 +121,7 @@ def main():
     BASICFONT = pygame.font.Font('freesansbold.ttf', 18)
     BIGFONT = pygame.font.Font('freesansbold.ttf', 100)
     pygame.display.set_caption('Tetromino')
+    buildBoxSprites()
 
     showTextScreen('Tetromino')
     while True:  # game loop
@@ -314,35 +134,39 @@ def main():
 
 def runGame():
     # setup variables for the start of the game
-    global EXTRA_CHANCE
-    global REROLLS
-    board = getBlankBoard()
-    lastMoveDownTime = time.time()
-    lastMoveSidewaysTime = time.time()
-    lastFallTime = time.time()
+    game = TetrisSimulation(DIFFICULTY, rng=RandomService(RNG.stream(GAMES).getrandbits(64)))
+    renderer = DirtyRenderer() if RENDER else None
+    if not REPLAYDIR:
+        playGame(game, renderer)
+        return
+    os.makedirs(REPLAYDIR, exist_ok=True)
+    pruneReplays(REPLAYDIR, REPLAYKEEP - 1)
+    with open(os.path.join(REPLAYDIR, time.strftime('%Y%m%d-%H%M%S.trpl')), 'wb') as log:
+        recorder = Recorder(log)
+        recorder.start(game)
+        playGame(game, renderer)
+        recorder.finish(game)
+
+
+def pruneReplays(directory, keep):
+    # delete all but the newest keep recordings in directory
+    logs = sorted(name for name in os.listdir(directory) if name.endswith('.trpl'))
+    for name in logs[:max(0, len(logs) - keep)]:
+        os.remove(os.path.join(directory, name))
+
+
+def playGame(game, renderer):
+    # Game logic runs in fixed ticks (see Scheduler.py); keys are read and
+    # the screen drawn once per frame.
+    clock = FixedStepClock(throttled=THROTTLED)
+    moveDownTimer = TickTimer(ticksFor(MOVEDOWNFREQ))
+    moveSidewaysTimer = TickTimer(ticksFor(MOVESIDEWAYSFREQ))
     movingDown = False  # note: there is no movingUp variable
     movingLeft = False
     movingRight = False
-    score = 0
-    level, fallFreq = calculateLevelAndFallFreq(score)
-
-    fallingPiece = getNewPiece()
-    nextPiece = getNewPiece()
 
     while True: # game loop
-        if fallingPiece == None:
-            # No falling piece in play, so start a new piece at the top
-            fallingPiece = nextPiece
-            nextPiece = getNewPiece()
-            lastFallTime = time.time() # reset lastFallTime
-
-            if not isValidPosition(board, fallingPiece):
-                if EXTRA_CHANCE:
-                    board = getBlankBoard()
-                    EXTRA_CHANCE = False
-                else:
-                    return  # can't fit a new piece on the board, so game over
-
+        PROFILER.begin(INPUT)
         checkForQuit()
         for event in pygame.event.get():  # event handling loop
             if event.type == KEYUP:
@@ -352,81 +176,89 @@ def runGame():
                     pygame.mixer.music.stop()
                     showTextScreen('Paused')  # pause until a key press
                     pygame.mixer.music.play(-1, 0.0)
-                    lastFallTime = time.time()
-                    lastMoveDownTime = time.time()
-                    lastMoveSidewaysTime = time.time()
+                    if renderer is not None:
+                        renderer.invalidate()
+                    clock.reset()
+                    game.fallTimer.reset()
+                    moveDownTimer.reset()
+                    moveSidewaysTimer.reset()
                 elif (event.key == K_LEFT or event.key == K_a):
                     movingLeft = False
                 elif (event.key == K_RIGHT or event.key == K_d):
                     movingRight = False
                 elif (event.key == K_DOWN or event.key == K_s):
                     movingDown = False
-                elif(event.key == K_r and REROLLS > 0):
-                    fallingPiece = getNewPiece()
-                    REROLLS -= 1
+                elif(event.key == K_r):
+                    game.apply(REROLL)
 
             elif event.type == KEYDOWN:
                 # moving the piece sideways
-                movingLeft, movingRight, lastMoveSidewaysTime = moveSideways(event, board, fallingPiece, movingLeft, movingRight, lastMoveSidewaysTime)
-
-                rotatePiece(event, fallingPiece, board)
+                if (event.key == K_LEFT or event.key == K_a) and game.apply(LEFT):
+                    movingLeft, movingRight = True, False
+                    moveSidewaysTimer.reset()
+                elif (event.key == K_RIGHT or event.key == K_d) and game.apply(RIGHT):
+                    movingLeft, movingRight = False, True
+                    moveSidewaysTimer.reset()
+
+                # rotating the piece (if there is room to rotate)
+                if event.key == K_UP or event.key == K_w:
+                    game.apply(ROTATE)
+                elif event.key == K_q:  # rotate the other direction
+                    game.apply(ROTATE_BACK)
 
                 # making the piece fall faster with the down key
                 if (event.key == K_DOWN or event.key == K_s):
                     movingDown = True
-                    if isValidPosition(board, fallingPiece, adjY=1):
-                        fallingPiece['y'] += 1
-                    lastMoveDownTime = time.time()
+                    game.apply(DOWN)
+                    moveDownTimer.reset()
 
                 # move the current piece all the way down
                 elif event.key == K_SPACE:
                     movingDown = False
                     movingLeft = False
                     movingRight = False
-                    for i in range(1, BOARDHEIGHT):
-                        if not isValidPosition(board, fallingPiece, adjY=i):
-                            break
-                    fallingPiece['y'] += i - 1
-
-        # handle moving the piece because of user input
-        if (movingLeft or movingRight) and time.time() - lastMoveSidewaysTime > MOVESIDEWAYSFREQ:
-            if movingLeft and isValidPosition(board, fallingPiece, adjX=-1):
-                fallingPiece['x'] -= 1
-            elif movingRight and isValidPosition(board, fallingPiece, adjX=1):
-                fallingPiece['x'] += 1
-            lastMoveSidewaysTime = time.time()
-
-        if movingDown and time.time() - lastMoveDownTime > MOVEDOWNFREQ and isValidPosition(board, fallingPiece, adjY=1):
-            fallingPiece['y'] += 1
-            lastMoveDownTime = time.time()
-
-        # let the piece fall if it is time to fall
-        if time.time() - lastFallTime > fallFreq:
-            # see if the piece has landed
-            if not isValidPosition(board, fallingPiece, adjY=1):
-                # falling piece has landed, set it on the board
-                addToBoard(board, fallingPiece)
-                score += removeCompleteLines(board)
-                level, fallFreq = calculateLevelAndFallFreq(score)
-                if(fallingPiece["shape"] == "HM"):
-                    holeMaker(fallingPiece, board)
-                fallingPiece = None
-            else:
-                # piece did not land, just move the piece down
-                fallingPiece['y'] += 1
-                lastFallTime = time.time()
-
-        # drawing everything on the screen
-        drawAll(BGCOLOR, board, score, level, nextPiece)
-        if fallingPiece != None:
-            drawPiece(fallingPiece)
+                    game.apply(HARD_DROP)
+
+        PROFILER.begin(UPDATE)
+        for tick in range(clock.ticksDue()):
+            if game.fallingPiece == None:
+                # No falling piece in play, so start a new piece at the top
+                game.spawn()
+                if game.gameOver:
+                    PROFILER.end_frame()
+                    return  # can't fit a new piece on the board, so game over
 
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+            # handle moving the piece because of user input
+            if moveSidewaysTimer.advance() and (movingLeft or movingRight):
+                game.apply(LEFT if movingLeft else RIGHT)
+                moveSidewaysTimer.reset()
+
+            if moveDownTimer.advance() and movingDown and game.apply(DOWN):
+                moveDownTimer.reset()
+
+            # let the piece fall if it is time to fall; it either moves down
+            # or lands and is set on the board
+            game.gravity()
+
+            game.ticks += 1
+
+        # drawing only what changed since the last frame
+        if renderer is not None:
+            PROFILER.begin(DRAW)
+            dirty = renderer.draw(game)
+            PROFILER.end_phase()
+            overlay = PROFILER.draw(DISPLAYSURF)
+            if overlay is not None:
+                dirty.append(overlay)
+            PROFILER.begin(FLIP)
+            pygame.display.update(dirty)
+        PROFILER.end_phase()
+        clock.waitForFrame(FPS)
+        PROFILER.end_frame()
 
 
 def makeTextObjs(text, font, color):
-    surf = font.render(text, True, color)
+    surf = render_text(font, text, True, color)
     return surf, surf.get_rect()
 
 
@@ -479,293 +311,252 @@ def checkForQuit():
         pygame.event.post(event)  # put the other KEYUP event objects back
 
 
-def calculateLevelAndFallFreq(score):
-    # Based on the score, return the level the player is on and
-    # how many seconds pass until a falling piece falls one space.
-    level = int(score / 10) + 1
-    fallFreq = 0.27 - (level * 0.02)
-    return level, fallFreq
-
-def getNewPiece():
-    # return a random new piece in a random rotation and color
-    piece_type = random.randint(0, 3)
-    global STOP_ROTATION
-    STOP_ROTATION = random.randint(0, 3)
-    if(piece_type == 3):
-        good_or_bad = random.randint(0,DIFFICULTY_MAX)
-        if(good_or_bad < DIFFICULTY):
-            shape = random.choice(list(EVIL_PIECES.keys()))
-            newPiece = {'shape': shape,
-             'rotation': random.randint(0, len(SINGLE_TEMPLATE) - 1),
-             'x': int(BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
-             'y': -2,  # start it above the board (i.e. less than 0)
-             'color': EVIL_PIECE_COLOR_NUMBER[shape],
-             'alignment': "evil"}
-        else:
-            shape = random.choice(list(NICE_PIECES.keys()))
-            newPiece = {'shape': shape,
-                        'rotation': random.randint(0, len(SINGLE_TEMPLATE) - 1),
-                        'x': int(BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
-                        'y': -2,  # start it above the board (i.e. less than 0)
-                        'color': NICE_PIECE_COLOR_NUMBER[shape],
-                        'alignment': "nice"}
-    else:
-        shape = random.choice(list(PIECES.keys()))
-        newPiece = {'shape': shape,
-                    'rotation': random.randint(0, len(PIECES[shape]) - 1),
-                    'x': int(BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
-                    'y': -2, # start it above the board (i.e. less than 0)
-                    'color': random.randint(0, len(COLORS)-1),
-                    'alignment': "neutral"}
-    return newPiece
-
-
-def addToBoard(board, piece):
-    # fill in the board based on piece's location, shape, and rotation
-    alignment = piece['alignment']
-    if alignment == "neutral":
-        pieces = PIECES
-    elif alignment == "evil":
-        pieces = EVIL_PIECES
-    elif alignment == "nice":
-        pieces = NICE_PIECES
-
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if pieces[piece['shape']][piece['rotation']][y][x] != BLANK:
-                board[x + piece['x']][y + piece['y']] = [piece['color'], piece['alignment'], piece['shape']]
-
-
-def getBlankBoard():
-    # create and return a new blank board data structure
-    board = []
-    for i in range(BOARDWIDTH):
-        board.append([BLANK] * BOARDHEIGHT)
-    return board
-
-
-def isOnBoard(x, y):
-    return x >= 0 and x < BOARDWIDTH and y < BOARDHEIGHT
-
-
-def isValidPosition(board, piece, adjX=0, adjY=0):
-    # Return True if the piece is within the board and not colliding
-    alignment = piece['alignment']
-    if alignment == "neutral":
-        pieces = PIECES
-    elif alignment == "evil":
-        pieces = EVIL_PIECES
-    elif alignment == "nice":
-        pieces = NICE_PIECES
-
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            isAboveBoard = y + piece['y'] + adjY < 0
-            if isAboveBoard or pieces[piece['shape']][piece['rotation']][y][x] == BLANK:
-                continue
-            if not isOnBoard(x + piece['x'] + adjX, y + piece['y'] + adjY):
-                return False
-            if board[x + piece['x'] + adjX][y + piece['y'] + adjY] != BLANK:
-                return False
-    return True
-
-
-def isCompleteLine(board, y):
-    # Return True if the line filled with boxes with no gaps.
-    for x in range(BOARDWIDTH):
-        if board[x][y] == BLANK:
-            return False
-    giveSpecialBonuses(board, y)
-    return True
-
-
-def giveSpecialBonuses(board, y):
-    # Check if there is an extra chance block in a completed row
-    global EXTRA_CHANCE
-    global REROLLS
-    for x in range(BOARDWIDTH):
-        if (board[x][y])[2] == "EC":
-            EXTRA_CHANCE = True
-        if (board[x][y])[2] == "RR":
-            REROLLS += 1
-
-
-def removeCompleteLines(board):
-    # Remove any completed lines on the board, move everything above them down, and return the number of complete lines.
-    numLinesRemoved = 0
-    y = BOARDHEIGHT - 1  # start y at the bottom of the board
-    while y >= 0:
-        if isCompleteLine(board, y):
-            # Remove the line and pull boxes down by one line.
-            for pullDownY in range(y, 0, -1):
-                for x in range(BOARDWIDTH):
-                    board[x][pullDownY] = board[x][pullDownY-1]
-            # Set very top line to blank.
-            for x in range(BOARDWIDTH):
-                board[x][0] = BLANK
-            numLinesRemoved += 1
-            # Note on the next iteration of the loop, y is the same.
-            # This is so that if the line that was pulled down is also
-            # complete, it will be removed.
-        else:
-            y -= 1  # move on to check next row up
-    return numLinesRemoved
-
-
 def convertToPixelCoords(boxx, boxy):
     # Convert the given xy coordinates of the board to xy
     # coordinates of the location on the screen.
     return (XMARGIN + (boxx * BOXSIZE)), (TOPMARGIN + (boxy * BOXSIZE))
 
 
-def drawAll(BGCOLOR, board, score, level, nextPiece):
-    DISPLAYSURF.fill(BGCOLOR)
-    drawBoard(board)
-    drawStatus(score, level)
-    drawNextPiece(nextPiece)
-    drawExtraChanceStatus()
-    drawReRollsStatus()
-
-
-def drawBox(boxx, boxy, color, alignment, pixelx=None, pixely=None):
-    # draw a single box (each tetromino piece has four boxes)
-    # at xy coordinates on the board. Or, if pixelx & pixely
-    # are specified, draw to the pixel coordinates stored in
-    # pixelx & pixely (this is used for the "Next" piece).
-    if alignment == "neutral":
-        colors = COLORS
-        light_colors = LIGHTCOLORS
-    elif alignment == "evil":
-        colors = EVIL_COLORS
-        light_colors = EVIL_LIGHT_COLORS
-    elif alignment == "nice":
-        colors = NICE_COLORS
-        light_colors = NICE_LIGHT_COLORS
-
-    if color == BLANK:
-        return
+class DirtyRenderer:
+    # Retained-mode drawing for runGame. It remembers the board cells, the
+    # falling piece boxes and the HUD values it drew last frame, redraws only
+    # what changed, and returns the rects to pass to pygame.display.update.
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        # Redraw the whole window next frame (e.g. after a text screen).
+        self.background = None
+        self.cells = None
+        self.pieceBoxes = set()
+        self.pieceKey = None
+        self.ghostBoxes = set()
+        self.hud = {}
+        self.hudRects = {}
+
+    def draw(self, game):
+        board = game.board
+        piece = game.fallingPiece
+        pieceBoxes = getPieceBoxes(piece)
+        pieceKey = None if piece == None else (piece['color'], piece['alignment'])
+        ghostBoxes = getGhostBoxes(game, pieceBoxes)
+
+        if self.cells is None or len(self.cells) != len(board.cells):
+            # the empty window is kept so dirty areas can be restored from it
+            DISPLAYSURF.fill(BGCOLOR)
+            drawBoardBorder()
+            drawBoardBackground()
+            self.background = DISPLAYSURF.copy()
+            drawBoardBoxes(board)
+            self.drawHud(game)
+            drawGhost(ghostBoxes)
+            if piece != None:
+                drawPiece(piece)
+            dirty = [DISPLAYSURF.get_rect()]
+        else:
+            dirtyBoxes = self.changedCells(board) | (pieceBoxes ^ self.pieceBoxes) | (ghostBoxes ^ self.ghostBoxes)
+            if pieceKey != self.pieceKey:
+                dirtyBoxes |= pieceBoxes
+            dirty = []
+            boxes = []
+            for x, y in dirtyBoxes:
+                # restore the empty window under the box, then redraw what is on it
+                pixelx, pixely = convertToPixelCoords(x, y)
+                rect = pygame.Rect(pixelx, pixely, BOXSIZE, BOXSIZE)
+                DISPLAYSURF.blit(self.background, rect, rect)
+                if board.isOnBoard(x, y):
+                    cell = board.getCell(x, y)
+                    if cell != BLANK:
+                        boxes.append(boxBlit(x, y, cell[0], cell[1]))
+                dirty.append(rect)
+            for x, y in dirtyBoxes & ghostBoxes:
+                boxes.append(ghostBlit(x, y))
+            for x, y in dirtyBoxes & pieceBoxes:
+                boxes.append(boxBlit(x, y, piece['color'], piece['alignment']))
+            DISPLAYSURF.blits(boxes, False)
+            dirty.extend(self.drawHud(game))
+
+        self.cells = bytes(board.cells)
+        self.pieceBoxes = pieceBoxes
+        self.pieceKey = pieceKey
+        self.ghostBoxes = ghostBoxes
+        return dirty
+
+    def changedCells(self, board):
+        # (x, y) of every board cell that differs from the last frame
+        changed = set()
+        old = self.cells
+        new = board.cells
+        if old == new:
+            return changed
+        width = board.width
+        for y in range(board.height):
+            start = y * width
+            if old[start:start + width] != new[start:start + width]:
+                for x in range(width):
+                    if old[start + x] != new[start + x]:
+                        changed.add((x, y))
+        return changed
+
+    def drawHud(self, game):
+        # Redraw each HUD item whose value changed; return the dirty rects.
+        nextPiece = game.nextPiece
+        nextKey = (nextPiece['shape'], nextPiece['rotation'], nextPiece['color'], nextPiece['alignment'])
+        items = (('status', (game.score, game.level), drawStatus, (game.score, game.level)),
+                 ('next', nextKey, drawNextPiece, (nextPiece,)),
+                 ('extraChance', game.extraChance, drawExtraChanceStatus, (game.extraChance,)),
+                 ('rerolls', game.rerolls, drawReRollsStatus, (game.rerolls,)))
+        dirty = []
+        for name, value, draw, args in items:
+            if name in self.hud and self.hud[name] == value:
+                continue
+            oldRect = self.hudRects.get(name)
+            if oldRect is not None:
+                DISPLAYSURF.blit(self.background, oldRect, oldRect)
+                dirty.append(oldRect)
+            rect = draw(*args)
+            dirty.append(rect)
+            self.hud[name] = value
+            self.hudRects[name] = rect
+        return dirty
+
+
+def getPieceBoxes(piece):
+    # board coordinates of every box of a piece (empty set for no piece)
+    if piece == None:
+        return set()
+    return {(piece['x'] + x, piece['y'] + y) for x, y in getShape(piece).offsets}
+
+
+def getGhostBoxes(game, pieceBoxes):
+    # board coordinates of the ghost: the boxes where a hard drop would put
+    # the falling piece, less any it already covers
+    distance = game.dropDistance()
+    if distance == 0:
+        return set()
+    return {(x, y + distance) for x, y in pieceBoxes} - pieceBoxes
+
+
+PALETTES = {"neutral": (COLORS, LIGHTCOLORS),
+            "evil": (EVIL_COLORS, EVIL_LIGHT_COLORS),
+            "nice": (NICE_COLORS, NICE_LIGHT_COLORS)}
+
+
+def buildBoxSprites():
+    # Pre-render one box surface per (alignment, color) so drawing a box is a
+    # single blit instead of two rect fills. Needs the display to be set up.
+    global BOX_SPRITES
+    BOX_SPRITES = {}
+    for alignment, (colors, light_colors) in PALETTES.items():
+        for color in range(len(colors)):
+            sprite = pygame.Surface((BOXSIZE - 1, BOXSIZE - 1)).convert()
+            sprite.fill(colors[color])
+            sprite.fill(light_colors[color], (0, 0, BOXSIZE - 4, BOXSIZE - 4))
+            BOX_SPRITES[alignment, color] = sprite
+
+    # the ghost piece is drawn as outlined boxes, the same for every piece
+    global GHOST_SPRITE
+    GHOST_SPRITE = pygame.Surface((BOXSIZE - 1, BOXSIZE - 1)).convert()
+    GHOST_SPRITE.fill(BGCOLOR)
+    pygame.draw.rect(GHOST_SPRITE, GREY, GHOST_SPRITE.get_rect(), 1)
+
+
+def boxBlit(boxx, boxy, color, alignment, pixelx=None, pixely=None):
+    # The (sprite, position) pair that draws a box, for Surface.blits().
     if pixelx == None and pixely == None:
         pixelx, pixely = convertToPixelCoords(boxx, boxy)
-    pygame.draw.rect(DISPLAYSURF, colors[color], (pixelx + 1, pixely + 1, BOXSIZE - 1, BOXSIZE - 1))
-    pygame.draw.rect(DISPLAYSURF, light_colors[color], (pixelx + 1, pixely + 1, BOXSIZE - 4, BOXSIZE - 4))
+    return BOX_SPRITES[alignment, color], (pixelx + 1, pixely + 1)
+
 
+def ghostBlit(boxx, boxy):
+    pixelx, pixely = convertToPixelCoords(boxx, boxy)
+    return GHOST_SPRITE, (pixelx + 1, pixely + 1)
 
-def drawBoard(board):
+
+def drawBoardBorder():
     # draw the border around the board
-    pygame.draw.rect(DISPLAYSURF, BORDERCOLOR, (XMARGIN - 3, TOPMARGIN - 7, (BOARDWIDTH * BOXSIZE) + 8, (BOARDHEIGHT * BOXSIZE) + 8), 5)
+    return pygame.draw.rect(DISPLAYSURF, BORDERCOLOR, (XMARGIN - 3, TOPMARGIN - 7, (BOARDWIDTH * BOXSIZE) + 8, (BOARDHEIGHT * BOXSIZE) + 8), 5)
+
 
+def drawBoardBackground():
     # fill the background of the board
     pygame.draw.rect(DISPLAYSURF, BGCOLOR, (XMARGIN, TOPMARGIN, BOXSIZE * BOARDWIDTH, BOXSIZE * BOARDHEIGHT))
-    # draw the individual boxes on the board
-    for x in range(BOARDWIDTH):
-        for y in range(BOARDHEIGHT):
-            if(board[x][y] == BLANK):
-                drawBox(x, y, board[x][y], 'neutral')
-            else:
-                drawBox(x, y, board[x][y][0], board[x][y][1])
+
+
+def drawBoardBoxes(board):
+    # draw the individual boxes on the board, all in one batch
+    boxes = []
+    for y in range(BOARDHEIGHT):
+        if not board.rows[y]:
+            continue
+        for x in range(BOARDWIDTH):
+            cell = board.getCell(x, y)
+            if cell != BLANK:
+                boxes.append(boxBlit(x, y, cell[0], cell[1]))
+    DISPLAYSURF.blits(boxes, False)
 
 
 def drawStatus(score, level):
     # draw the score text
-    scoreSurf = BASICFONT.render('Score: %s' % score, True, TEXTCOLOR)
+    scoreSurf = render_text(BASICFONT, 'Score: %s' % score, True, TEXTCOLOR)
     scoreRect = scoreSurf.get_rect()
     scoreRect.topleft = (WINDOWWIDTH - 150, 20)
     DISPLAYSURF.blit(scoreSurf, scoreRect)
 
     # draw the level text
-    levelSurf = BASICFONT.render('Level: %s' % level, True, TEXTCOLOR)
+    levelSurf = render_text(BASICFONT, 'Level: %s' % level, True, TEXTCOLOR)
     levelRect = levelSurf.get_rect()
     levelRect.topleft = (WINDOWWIDTH - 150, 50)
     DISPLAYSURF.blit(levelSurf, levelRect)
+    return scoreRect.union(levelRect)
 
 
 def drawPiece(piece, pixelx=None, pixely=None):
-    if(piece["alignment"] == "neutral"):
-        shapeToDraw = PIECES[piece['shape']][piece['rotation']]
-    elif(piece["alignment"] == "evil"):
-        shapeToDraw = EVIL_PIECES[piece['shape']][piece['rotation']]
-    elif(piece["alignment"] == "nice"):
-        shapeToDraw = NICE_PIECES[piece['shape']][piece['rotation']]
-
     if pixelx == None and pixely == None:
         # if pixelx & pixely hasn't been specified, use the location stored in the piece data structure
         pixelx, pixely = convertToPixelCoords(piece['x'], piece['y'])
 
     # draw each of the boxes that make up the piece
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if shapeToDraw[y][x] != BLANK:
-                drawBox(None, None, piece['color'], piece['alignment'], pixelx + (x * BOXSIZE), pixely + (y * BOXSIZE))
+    sprite = BOX_SPRITES[piece['alignment'], piece['color']]
+    DISPLAYSURF.blits([(sprite, (pixelx + (x * BOXSIZE) + 1, pixely + (y * BOXSIZE) + 1))
+                       for x, y in getShape(piece).offsets], False)
+
+
+def drawGhost(ghostBoxes):
+    DISPLAYSURF.blits([ghostBlit(x, y) for x, y in ghostBoxes], False)
 
 
 def drawNextPiece(piece):
     # draw the "next" text
-    nextSurf = BASICFONT.render('Next:', True, TEXTCOLOR)
+    nextSurf = render_text(BASICFONT, 'Next:', True, TEXTCOLOR)
     nextRect = nextSurf.get_rect()
     nextRect.topleft = (WINDOWWIDTH - 120, 80)
     DISPLAYSURF.blit(nextSurf, nextRect)
     # draw the "next" piece
     drawPiece(piece, pixelx=WINDOWWIDTH-120, pixely=100)
+    return nextRect.union((WINDOWWIDTH-120, 100, TEMPLATEWIDTH * BOXSIZE, TEMPLATEHEIGHT * BOXSIZE))
 
 
-def drawExtraChanceStatus():
-    if EXTRA_CHANCE:
+def drawExtraChanceStatus(extraChance):
+    if extraChance:
         ec_status = "Yes"
     else:
         ec_status = "No"
-    nextSurf = BASICFONT.render('Extra Chance?  ' + ec_status, True, TEXTCOLOR)
+    nextSurf = render_text(BASICFONT, 'Extra Chance?  ' + ec_status, True, TEXTCOLOR)
     nextRect = nextSurf.get_rect()
     nextRect.topleft = (WINDOWWIDTH - 170, 200)
     DISPLAYSURF.blit(nextSurf, nextRect)
+    return nextRect
 
 
-def drawReRollsStatus():
-    nextSurf = BASICFONT.render('Re-rolls:  ' + str(REROLLS), True, TEXTCOLOR)
+def drawReRollsStatus(rerolls):
+    nextSurf = render_text(BASICFONT, 'Re-rolls:  ' + str(rerolls), True, TEXTCOLOR)
     nextRect = nextSurf.get_rect()
     nextRect.topleft = (WINDOWWIDTH - 170, 300)
     DISPLAYSURF.blit(nextSurf, nextRect)
+    return nextRect
 
 
-def moveSideways(event, board, fallingPiece, movingLeft, movingRight, lastMoveSidewaysTime):
-    if (event.key == K_LEFT or event.key == K_a) and isValidPosition(board, fallingPiece, adjX=-1):
-        fallingPiece['x'] -= 1
-        return (True, False, time.time())
-
-    elif (event.key == K_RIGHT or event.key == K_d) and isValidPosition(board, fallingPiece, adjX=1):
-        fallingPiece['x'] += 1
-        return(False, True, time.time())
-    return(movingLeft, movingRight, lastMoveSidewaysTime)
-
-
-def rotatePiece(event, fallingPiece, board):
-    alignment = fallingPiece['alignment']
-    if alignment == "neutral":
-        pieces = PIECES
-    elif alignment == "evil":
-        pieces = EVIL_PIECES
-    elif alignment == "nice":
-        pieces = NICE_PIECES
-
-    # rotating the piece (if there is room to rotate)
-    # no rotation of a piece
-    if STOP_ROTATION == 3 and DIFFICULTY >= 75:
-        pass
-    # regular piece rotation
-    elif STOP_ROTATION < 15:
-        if event.key == K_UP or event.key == K_w:
-            fallingPiece['rotation'] = (fallingPiece['rotation'] + 1) % len(pieces[fallingPiece['shape']])
-            if not isValidPosition(board, fallingPiece):
-                fallingPiece['rotation'] = (fallingPiece['rotation'] - 1) % len(pieces[fallingPiece['shape']])
-        elif event.key == K_q:  # rotate the other direction
-            fallingPiece['rotation'] = (fallingPiece['rotation'] - 1) % len(pieces[fallingPiece['shape']])
-            if not isValidPosition(board, fallingPiece):
-                fallingPiece['rotation'] = (fallingPiece['rotation'] + 1) % len(pieces[fallingPiece['shape']])
-
-
-def holeMaker(piece, board):
-    if(piece['y'] < BOARDHEIGHT - 3):
-        to_delete = random.randint(piece['y'] + 3, BOARDHEIGHT - 1)
-        board[piece['x'] + 2][to_delete] = BLANK
-
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,393 @@
+"""
+Benchmarks of the games' hot paths.
+
+Every scenario is a fixed, seeded workload on one game's code, run headless
+(SDL's dummy video driver) so the numbers don't depend on a window. Each one
+is timed several times and the median run counts, then run once more under
+tracemalloc for its peak memory and the blocks it leaves allocated. Results
+are saved as a baseline and later runs compared against it: a scenario that
+got slower, needs more memory or keeps more blocks, by more than the
+tolerance, fails the run.
+
+    python -m homework.Benchmark --save          # record a baseline
+    python -m homework.Benchmark                 # compare with it
+    python -m homework.Benchmark tetris-drop-200 bricka-level5-balls
+
+Baselines depend on the machine, so none is kept in the repository; record
+one before comparing. PartA and PartD are driven through the frame steps
+their game loops call (PartA.growFood, PartD.updateBaddies, ...).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+HOMEWORK = os.path.dirname(os.path.abspath(__file__))
+# Tetris, PartA and PartD import their modules as siblings
+sys.path.append(os.path.join(HOMEWORK, "2", "EvilOrNice"))
+sys.path.append(os.path.join(HOMEWORK, "1", "PartA"))
+sys.path.append(os.path.join(HOMEWORK, "1", "PartD"))
+
+from homework.common.Rng import RandomService, LEVELS
+
+BASELINE = os.path.join(HOMEWORK, "benchmark_baseline.json")
+
+# how much slower or bigger than the baseline a scenario may get, unless it
+# was registered with its own tolerance or one is given on the command line
+TOLERANCE = 0.15
+# memory growth under this many KiB, or blocks, is noise, whatever the tolerance
+MEMORY_SLACK_KIB = 64
+BLOCK_SLACK = 100
+# each timed sample runs a scenario afresh until it has taken this long
+SAMPLE_SECONDS = 0.25
+
+SCENARIOS = {}
+
+
+def scenario(name, unit, tolerance=TOLERANCE):
+    """
+    Register a scenario. The decorated function takes a seed, sets up the
+    workload and returns a function that does it and returns how many units
+    of work (pieces, frames, ...) that was. Scenarios whose timings are
+    noisier than most get a larger tolerance.
+    """
+    def register(setup):
+        SCENARIOS[name] = (setup, unit, tolerance)
+        return setup
+    return register
+
+
+class Skip(Exception):
+    """A scenario that can't run here (a missing optional dependency)."""
+
+
+# Tetris
+
+TALL = 200
+
+
+def filled_board(rng, rows, holes):
+    # a TALL-row board with its bottom rows filled, each but every holes-th
+    # one with a random gap
+    from Simulation import getBlankBoard, BOARDWIDTH
+    board = getBlankBoard(BOARDWIDTH, TALL)
+    for y in range(TALL - rows, TALL):
+        gap = rng.randrange(BOARDWIDTH) if holes and y % holes else None
+        for x in range(BOARDWIDTH):
+            if x != gap:
+                board.setCell(x, y, (rng.randrange(4), "neutral", "I"))
+    return board
+
+
+@scenario("tetris-clear-200", "lines")
+def tetris_clear(seed):
+    # removeCompleteLines on a 200-row board whose bottom half is every
+    # other line full
+    from Simulation import removeCompleteLines
+    board = filled_board(RandomService(seed).stream("bench"), TALL // 2, 2)
+
+    def run():
+        lines = 0
+        for _ in range(200):
+            lines += len(removeCompleteLines(board.copy()))
+        return lines
+    return run
+
+
+@scenario("tetris-drop-200", "pieces")
+def tetris_drop(seed):
+    # hard drops, each a few columns to either side, on a 200-row board
+    from Simulation import TetrisSimulation, LEFT, RIGHT, HARD_DROP
+
+    def run():
+        rng = RandomService(seed)
+        moves = rng.stream("bench")
+        game = TetrisSimulation(height=TALL, rng=rng)
+        pieces = 0
+        while pieces + game.piecesPlaced < 2000:
+            if game.gameOver:
+                pieces += game.piecesPlaced
+                game = TetrisSimulation(height=TALL, rng=rng)
+            game.spawn()
+            shift = moves.randint(-6, 6)
+            for _ in range(abs(shift)):
+                game.apply(LEFT if shift < 0 else RIGHT)
+            game.apply(HARD_DROP)
+            game.fall()
+        return pieces + game.piecesPlaced
+    return run
+
+
+@scenario("tetris-fits-200", "checks")
+def tetris_fits(seed):
+    # isValidPosition for pieces all over a 200-row board that is half full
+    from Simulation import getNewPieces, isValidPosition, BOARDWIDTH
+    rng = RandomService(seed).stream("bench")
+    board = filled_board(rng, TALL // 2, 1)
+    pieces = getNewPieces(1000, 50, BOARDWIDTH, rng)
+    for piece in pieces:
+        piece["x"] = rng.randint(-2, BOARDWIDTH - 2)
+        piece["y"] = rng.randint(-2, TALL - 2)
+
+    def run():
+        for piece in pieces:
+            for adjX, adjY in ((0, 0), (-1, 0), (1, 0), (0, 1)):
+                isValidPosition(board, piece, adjX, adjY)
+        return 4 * len(pieces)
+    return run
+
+
+@scenario("tetris-ai", "pieces")
+def tetris_ai(seed):
+    # the default search bot (one-piece lookahead) playing a standard game
+    from AIPlayer import AIPlayer, playGame
+
+    def run():
+        return playGame(0, 500, AIPlayer(), seed).piecesPlaced
+    return run
+
+
+# Bricka
+
+@scenario("bricka-level5-1ball", "frames")
+def bricka_single(seed):
+    # a bot playing Level 5 with the game's own move_ball/handle_collisions
+    from homework.HW_3.Analyzer import BotBricka
+    game = BotBricka(5, seed)
+
+    def run():
+        game.play(5000)
+        return game.frames
+    return run
+
+
+# small NumPy arrays: allocator and dispatch overheads move this around
+@scenario("bricka-level5-balls", "ball steps", tolerance=0.25)
+def bricka_balls(seed):
+    # 200 balls at once on Level 5 (multi-ball)
+    try:
+        from homework.HW_3.__main__.World import BrickaWorld
+    except ImportError:
+        raise Skip("needs NumPy")
+    world = BrickaWorld.for_level(5, RandomService(seed).stream(LEVELS))
+    world.levels.prefetch_at = -1
+
+    def run():
+        steps = 0
+        for frame in range(1000):
+            if len(world) < 50:
+                world.launch_fan(300, 400, 200 - len(world), 7)
+            world.paddle_x = min(max(int(world.pos[:, 0].mean()) - 50, 0), 540)
+            steps += len(world)
+            world.step()
+        return steps
+    return run
+
+
+# blits and display flips vary by up to a quarter between runs
+@scenario("bricka-draw", "frames", tolerance=0.3)
+def bricka_draw(seed):
+    # drawing Level 5 as it gets hit, one brick every other frame
+    from homework.HW_3.bricka import Bricka
+    game = Bricka()
+    game.levels.rng = RandomService(seed).stream(LEVELS)
+    game.levels.current_level = 4
+    game.init_next_level()
+    game.levels.prefetch_at = -1
+    rng = RandomService(seed).stream("bench")
+
+    def run():
+        for frame in range(500):
+            if frame % 2 and game.bricks:
+                brick = game.bricks[rng.randrange(len(game.bricks))]
+                brick.onHit()
+                if brick.hits_to_break == 0:
+                    game.remove_brick(brick)
+            game.draw_bricks()
+            pygame.draw.rect(game.screen, (0, 0, 255), game.paddle)
+            pygame.display.flip()
+        return 500
+    return run
+
+
+# PartA: the player eating through the food
+
+@scenario("parta-food-10k", "frames")
+def parta_food(seed):
+    import PartA
+    from FoodGrid import FoodGrid
+    rng = RandomService(seed).stream("bench")
+    size = (PartA.WINDOWWIDTH, PartA.WINDOWHEIGHT)
+    surface = pygame.Surface(size)
+    foods = FoodGrid(size, PartA.GREEN, PartA.WHITE)
+    for _ in range(10000):
+        PartA.addFood(foods, rng)
+    player = pygame.Rect(300, 100, 50, 50)
+
+    def run():
+        color = PartA.PLAYER_COLOR
+        counter = 0
+        right = down = True
+        for frame in range(50):
+            # hold the keys that bounce the player around the window
+            if player.right >= PartA.WINDOWWIDTH or player.left <= 0:
+                right = player.left <= 0
+            if player.bottom >= PartA.WINDOWHEIGHT or player.top <= 0:
+                down = player.top <= 0
+            counter = PartA.growFood(foods, counter, rng)
+            surface.fill(PartA.WHITE)
+            PartA.movePlayer(player, not right, right, not down, down)
+            pygame.draw.rect(surface, color, player)
+            color = PartA.eatFood(player, foods, color, rng)
+            foods.draw(surface)
+        return 50
+    return run
+
+
+# PartD: the screen as full of baddies as it gets
+
+@scenario("partd-baddies-peak", "frames")
+def partd_baddies(seed):
+    import PartD
+    rng = RandomService(seed).stream("bench")
+    surface = pygame.Surface((PartD.WINDOWWIDTH, PartD.WINDOWHEIGHT))
+    image = pygame.image.load(os.path.join(os.path.dirname(PartD.__file__), "baddie.png"))
+    player = pygame.Rect(PartD.WINDOWWIDTH // 2, PartD.WINDOWHEIGHT - 50, 40, 40)
+    # a baddie every frame instead of every sixth, run until the screen is
+    # about as full as that gets
+    baddies = []
+    counter = 0
+    for _ in range(300):
+        counter = PartD.updateBaddies(baddies, counter, image, rng=rng, addRate=1)
+
+    def run():
+        added = counter
+        for frame in range(300):
+            added = PartD.updateBaddies(baddies, added, image, rng=rng, addRate=1)
+            surface.fill(PartD.BACKGROUNDCOLOR)
+            surface.blit(image, player)
+            PartD.drawBaddies(surface, baddies)
+            PartD.playerHasHitBaddie(player, baddies, False)
+        return 300
+    return run
+
+
+def measure(name, seed, repeat):
+    """
+    {ops, ops_per_sec, spread, peak_kib, retained_blocks} of one scenario.
+    ops_per_sec is the median of repeat timed samples (see SAMPLE_SECONDS)
+    and spread how far apart the fastest and slowest were, relative to it.
+    retained_blocks counts the memory blocks a run allocated and had not
+    freed by its end.
+    """
+    setup, unit = SCENARIOS[name][:2]
+    rates = []
+    for _ in range(repeat):
+        done = elapsed = 0
+        while elapsed < SAMPLE_SECONDS:
+            run = setup(seed)
+            start = time.perf_counter()
+            ops = run()
+            elapsed += time.perf_counter() - start
+            done += ops
+        rates.append(done / elapsed)
+    median = statistics.median(rates)
+    run = setup(seed)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        blocks = len(tracemalloc.take_snapshot().traces)
+    finally:
+        tracemalloc.stop()
+    return {"unit": unit, "ops": ops, "ops_per_sec": median, "spread": (max(rates) - min(rates)) / median,
+            "peak_kib": peak / 1024, "retained_blocks": blocks}
+
+
+def regressions(name, result, baseline, tolerance):
+    # what about result is worse than baseline by more than tolerance
+    problems = []
+    if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - tolerance):
+        problems.append("%.0f %s/s, was %.0f" % (result["ops_per_sec"], result["unit"], baseline["ops_per_sec"]))
+    if result["peak_kib"] > baseline["peak_kib"] * (1 + tolerance) + MEMORY_SLACK_KIB:
+        problems.append("peak %.0f KiB, was %.0f" % (result["peak_kib"], baseline["peak_kib"]))
+    if "retained_blocks" in baseline and \
+            result["retained_blocks"] > baseline["retained_blocks"] * (1 + tolerance) + BLOCK_SLACK:
+        problems.append("%d blocks retained, was %d" % (result["retained_blocks"], baseline["retained_blocks"]))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the games' hot paths and compare with a baseline.")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all of them)")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per scenario; the median counts")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="fail when a scenario is this much slower or bigger than the baseline "
+                             "(default: %.2f, or the scenario's own)" % TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (setup, unit, tolerance) in SCENARIOS.items():
+            print("%-22s %-12s tolerance %.2f" % (name, unit, tolerance))
+        return 0
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error("unknown scenario: %s" % ", ".join(unknown))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file).get("scenarios", {})
+    elif not args.save:
+        print("no baseline at %s; run with --save to record one" % args.baseline, file=sys.stderr)
+        return 2
+
+    pygame.init()
+    results = {}
+    failed = []
+    for name in args.scenarios or SCENARIOS:
+        try:
+            result = results[name] = measure(name, args.seed, args.repeat)
+        except Skip as reason:
+            print("%-22s skipped: %s" % (name, reason))
+            continue
+        line = "%-22s %12.0f %s/s  spread %4.1f%%  peak %8.0f KiB  %7d blocks" % (
+            name, result["ops_per_sec"], result["unit"], 100 * result["spread"], result["peak_kib"],
+            result["retained_blocks"])
+        if name in baseline:
+            change = result["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1
+            line += "  %+6.1f%%" % (100 * change)
+            tolerance = SCENARIOS[name][2] if args.tolerance is None else args.tolerance
+            problems = regressions(name, result, baseline[name], tolerance)
+            if problems:
+                failed.append(name)
+                line += "  REGRESSION: " + "; ".join(problems)
+        print(line)
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "seed": args.seed, "scenarios": results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print("saved the baseline to %s" % args.baseline, file=sys.stderr)
+    if failed:
+        print("%d scenarios regressed: %s" % (len(failed), " ".join(failed)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Level analyzer for bricka.
+
+Plays every level many times with a seeded paddle bot, headless and as fast
+as the CPU allows, spread over worker processes. The bot plays by the game's
+own rules (Bricka.move_ball and handle_collisions, at the game's 50 frames a
+second), and for each level the analyzer reports how often the bot cleared
+it, how long that took and which bricks no game ever hit -- the pockets the
+ball can't get into.
+
+    python -m homework.HW_3.Analyzer --games 200
+    python -m homework.HW_3.Analyzer --levels 4 5 --min-clear-rate 0.9
+
+With --min-clear-rate the exit status is 1 if any level is cleared less
+often than that, so a new level pack can be checked before it ships.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+from homework.HW_3.bricka import Bricka
+from homework.HW_3.__main__.Brick import Brick
+from homework.HW_3.__main__.Constants import Constants as Consts
+from homework.HW_3.__main__.Levels import Levels
+from homework.HW_3.__main__.LevelFiles import KIND_NUMBERS
+from homework.common.Rng import RandomService, LEVELS
+
+CONSTANTS = Consts()
+
+FPS = 50                    # frames a second of Bricka.run
+BOT = "bot"                 # stream the paddle bot draws from
+
+KIND_NAMES = {number: name for name, number in KIND_NUMBERS.items()}
+
+
+class BotBricka(Bricka):
+    """
+    A Bricka with no window, playing one level with a paddle bot.
+
+    The bot moves the paddle at the keyboard's speed towards where it wants
+    the ball to land on it, picking a new spot after every bounce so that it
+    plays all four of the paddle's angles.
+    """
+
+    def __init__(self, level, seed):
+        self.rng = RandomService(seed)
+        self.bot = self.rng.stream(BOT)
+        self.frames = 0
+        self.hit = set()            # store indices of the bricks hit
+        self.lives = 3
+        self.score = 0
+        self.levels = Levels(self.rng.stream(LEVELS))
+        self.levels.clock = lambda: self.frames * 1000 // FPS
+        self.levels.current_level = level - 1
+        self.init_next_level()
+        self.levels.prefetch_at = -1  # only this level is played
+        self.aim = self.pick_aim()
+
+    def pick_aim(self):
+        # where on the paddle the bot wants the ball's center
+        return self.bot.uniform(0, CONSTANTS.PADDLE_WIDTH)
+
+    def steer(self):
+        target = self.ball.centerx - self.aim
+        step = max(-CONSTANTS.PADDLE_MOVE_INCREMENT, min(CONSTANTS.PADDLE_MOVE_INCREMENT, target - self.paddle.left))
+        self.paddle.left = max(0, min(CONSTANTS.MAX_PADDLE_X, self.paddle.left + round(step)))
+
+    def launch(self):
+        # put the paddle somewhere and launch from there, as Bricka.run does
+        self.paddle.left = self.bot.randint(0, CONSTANTS.MAX_PADDLE_X)
+        self.ball.left = self.paddle.left + self.paddle.width / 2
+        self.ball.top = self.paddle.top - self.ball.height
+        self.ball_vel = list(CONSTANTS.BALL_VELOCITY)
+        self.state = CONSTANTS.STATE_PLAYING
+
+    def ball_hit(self, thing, x, y, vx, vy, hit_x, hit_y):
+        if thing is self.paddle:
+            self.aim = self.pick_aim()
+        elif isinstance(thing, Brick):
+            self.hit.add(thing.index)
+        return super().ball_hit(thing, x, y, vx, vy, hit_x, hit_y)
+
+    def play(self, max_frames):
+        # Play until the level is cleared, the lives run out or max_frames
+        # have gone by. Returns whether the level was cleared.
+        while self.frames < max_frames:
+            self.frames += 1
+            if self.state == CONSTANTS.STATE_BALL_IN_PADDLE:
+                self.launch()
+            elif self.state == CONSTANTS.STATE_PLAYING:
+                self.steer()
+                self.move_ball()
+                self.handle_collisions()
+            else:
+                break
+        return self.state == CONSTANTS.STATE_GET_NEXT_LEVEL
+
+
+def play_level(level, seed, max_frames):
+    # One bot game of level; returns its result, bricks as (kind, x, y).
+    game = BotBricka(level, seed)
+    cleared = game.play(max_frames)
+    store = game.levels.store
+    bricks = [(KIND_NAMES[store.kind[i]], store.x[i], store.y[i]) for i in range(len(store))]
+    return {"level": level,
+            "seed": seed,
+            "cleared": cleared,
+            "frames": game.frames,
+            "score": game.score,
+            "bricks": bricks,
+            "hit": [bricks[i] for i in sorted(game.hit)]}
+
+
+def _play_job(job):
+    return play_level(*job)
+
+
+def make_jobs(levels, games, seed, max_frames):
+    # the same seeds on every level
+    for level in levels:
+        for i in range(games):
+            yield (level, seed + i, max_frames)
+
+
+def analyze(jobs, processes=None, chunksize=4):
+    # Play the jobs over a pool and sum the results up per level.
+    stats = {}
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(_play_job, jobs, chunksize):
+            level = stats.setdefault(result["level"], {"games": 0, "cleared": 0, "clear_frames": 0,
+                                                       "frames": 0, "bricks": set(), "hit": set()})
+            level["games"] += 1
+            level["frames"] += result["frames"]
+            if result["cleared"]:
+                level["cleared"] += 1
+                level["clear_frames"] += result["frames"]
+            level["bricks"].update(result["bricks"])
+            level["hit"].update(result["hit"])
+    return stats
+
+
+def report(stats, output):
+    for number in sorted(stats):
+        level = stats[number]
+        clear_rate = level["cleared"] / level["games"]
+        line = "level %d: cleared %d of %d games (%.0f%%)" % (number, level["cleared"], level["games"], 100 * clear_rate)
+        if level["cleared"]:
+            frames = level["clear_frames"] / level["cleared"]
+            line += ", in %.0f frames (%.1f s) on average" % (frames, frames / FPS)
+        print(line, file=output)
+        never_hit = sorted(level["bricks"] - level["hit"], key=lambda brick: (brick[2], brick[1]))
+        if never_hit:
+            print("    %d bricks never hit:" % len(never_hit), file=output)
+            for kind, x, y in never_hit:
+                print("        %s at (%d, %d)" % (kind, x, y), file=output)
+
+
+def all_levels():
+    levels = Levels()
+    number = 1
+    while levels.has_level(number):
+        yield number
+        number += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play every bricka level with seeded bots and report how they went.")
+    parser.add_argument("--levels", type=int, nargs="+", help="levels to play (default: all of them)")
+    parser.add_argument("--games", type=int, default=100, help="games per level")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game of each level")
+    parser.add_argument("--minutes", type=float, default=10, help="give up on a game after this much game time")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--min-clear-rate", type=float, help="fail if a level is cleared less often than this")
+    args = parser.parse_args(argv)
+
+    levels = args.levels or list(all_levels())
+    max_frames = int(args.minutes * 60 * FPS)
+    start = time.perf_counter()
+    stats = analyze(make_jobs(levels, args.games, args.seed, max_frames), args.processes)
+    report(stats, sys.stdout)
+
+    frames = sum(level["frames"] for level in stats.values())
+    seconds = time.perf_counter() - start
+    print("played %d frames in %.1f s, %.0fx real time" % (frames, seconds, frames / FPS / seconds), file=sys.stderr)
+    if args.min_clear_rate is not None:
+        failing = [number for number, level in stats.items() if level["cleared"] < args.min_clear_rate * level["games"]]
+        if failing:
+            print("levels below the clear rate: %s" % " ".join(map(str, sorted(failing))), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,4 @@
 import pygame
-import random
 from .Constants import Constants as Consts
 
 CONSTANTS = Consts()
@@ -19,76 +18,166 @@ class Brick:
         STATUS.UNBREAKABLE: CONSTANTS.GREY,
     }
 
-    hits_to_break = 1
-
-    def __init__(self, x_ofs, y_ofs, status = STATUS.NORMAL):
-        self.rect = pygame.Rect(x_ofs, y_ofs, CONSTANTS.BRICK_WIDTH, CONSTANTS.BRICK_HEIGHT)
-        self.status = status
-        self.color = CONSTANTS.RED
+    # A brick is a view of one row of a BrickStore; everything about it
+    # lives in the store's arrays.
+    __slots__ = ("store", "index")
+
+    KIND = 0                # index into KINDS, set below
+    HITS = 1                # hits_to_break of a new brick
+    COLOR = CONSTANTS.RED   # color of a new brick
+
+    def __init__(self, store, x_ofs, y_ofs, status = STATUS.NORMAL):
+        self.store = store
+        self.index = self.store.add(self.KIND, x_ofs, y_ofs, CONSTANTS.BRICK_WIDTH, CONSTANTS.BRICK_HEIGHT,
+                                    self.HITS, self.COLOR, status)
+
+    @classmethod
+    def view(cls, store, index):
+        brick = cls.__new__(cls)
+        brick.store = store
+        brick.index = index
+        return brick
+
+    @property
+    def rect(self):
+        return self.store.rect(self.index)
+
+    # (left, top, right, bottom), cheaper than rect where no Rect is needed
+    @property
+    def edges(self):
+        return self.store.edges(self.index)
+
+    @property
+    def status(self):
+        return self.store.status[self.index]
+
+    @status.setter
+    def status(self, status):
+        self.store.status[self.index] = status
+
+    @property
+    def color(self):
+        return self.store.palette[self.store.color[self.index]]
+
+    @color.setter
+    def color(self, color):
+        self.store.set_color(self.index, color)
+
+    @property
+    def hits_to_break(self):
+        return self.store.hits[self.index]
+
+    @hits_to_break.setter
+    def hits_to_break(self, hits_to_break):
+        self.store.hits[self.index] = hits_to_break
+
+    @property
+    def alive(self):
+        return bool(self.store.alive[self.index])
+
+    @alive.setter
+    def alive(self, alive):
+        self.store.set_alive(self.index, alive)
+
+    # the Levels counting breakable bricks, told whenever a brick starts or
+    # stops being breakable (hits_to_break > 0)
+    @property
+    def owner(self):
+        return self.store.owner
+
+    @owner.setter
+    def owner(self, owner):
+        self.store.owner = owner
+
+    def set_hits(self, hits_to_break):
+        was_breakable = self.hits_to_break > 0
+        self.hits_to_break = hits_to_break
+        if self.owner is not None and was_breakable != (hits_to_break > 0):
+            self.owner.on_brick_changed(self, hits_to_break > 0)
 
     def onHit(self):
         self.status = Brick.STATUS.DESTROYED
-        self.hits_to_break = 0
+        self.set_hits(0)
 
 class StrongBrick(Brick):
-    def __init__(self, x_ofs, y_ofs, status = Brick.STATUS.NORMAL):
-        Brick.__init__(self, x_ofs, y_ofs, status)
-        self.hits_to_break = 2
-        self.color = CONSTANTS.GREEN
+    __slots__ = ()
+
+    HITS = 2
+    COLOR = CONSTANTS.GREEN
 
     def onHit(self):
         if self.hits_to_break > 0:
-            self.hits_to_break -= 1
+            self.set_hits(self.hits_to_break - 1)
             self.color = CONSTANTS.RED
         else:
             self.status = Brick.STATUS.DESTROYED
             self.color = Brick.STATUS_COLORS[Brick.STATUS.DESTROYED]
 
 class UnbreakableBrick(Brick):
+    __slots__ = ()
 
-    hits_to_break = -1
-
-    def __init__(self, x_ofs, y_ofs, status = Brick.STATUS.NORMAL):
-        Brick.__init__(self, x_ofs, y_ofs, status)
-        self.color = CONSTANTS.GREY
+    HITS = -1
+    COLOR = CONSTANTS.GREY
 
     def onHit(self):
         pass
 
 class ThanosBrick(Brick):
-    count = 0
-    randUnlockTime = random.randint(240000, 360000)
-    def __init__(self, x_ofs, y_ofs, status = Brick.STATUS.NORMAL):
-        Brick.__init__(self, x_ofs, y_ofs, status)
-        self.color = CONSTANTS.PURPLE
-        self.hits_to_break = -1
+    __slots__ = ()
+
+    HITS = -1
+    COLOR = CONSTANTS.PURPLE
+
+    # range of the ms of play before they can be broken, drawn per level
+    UNLOCK_TIMES = (240000, 360000)
+
+    # how many times it has been unlocked
+    @property
+    def count(self):
+        return self.store.extra[self.index]
+
+    @count.setter
+    def count(self, count):
+        self.store.extra[self.index] = count
 
     def onHit(self):
 
-        if pygame.time.get_ticks() >= self.randUnlockTime:
+        clock = pygame.time.get_ticks if self.owner is None else self.owner.clock
+        if clock() >= self.store.unlock_time:
             if self.count == 0:
                 self.count += 1
-                self.hits_to_break = 3
+                self.set_hits(3)
                 pass
 
             if self.hits_to_break > 0:
                 if self.hits_to_break == 3:
-                    self.hits_to_break += -1
+                    self.set_hits(self.hits_to_break - 1)
                     pass
                 elif self.hits_to_break == 2:
-                    self.hits_to_break += -1
+                    self.set_hits(self.hits_to_break - 1)
                     self.color = CONSTANTS.GREEN
                 else:
-                    self.hits_to_break += -1
+                    self.set_hits(self.hits_to_break - 1)
                     self.color = CONSTANTS.RED
             else:
                 self.status = Brick.STATUS.DESTROYED
                 self.color = Brick.STATUS_COLORS[Brick.STATUS.DESTROYED]
 
 class CamoUnbreakableBrick(Brick):
+    __slots__ = ()
 
-    hits_to_break = -1
+    HITS = -1
 
     def onHit(self):
         self.color = CONSTANTS.GREY
-        self.STATUS.UNBREAKABLE
\ No newline at end of file
+        self.STATUS.UNBREAKABLE
+
+
+KINDS = (Brick, StrongBrick, UnbreakableBrick, ThanosBrick, CamoUnbreakableBrick)
+for kind, brick_class in enumerate(KINDS):
+    brick_class.KIND = kind
+
+
+def brick_view(store, index):
+    # the Brick of the right class for row index of store
+    return KINDS[store.kind[index]].view(store, index)
@@ -0,0 +1,60 @@
+import math
+
+from .Constants import Constants as Consts
+
+CONSTANTS = Consts()
+
+
+class BrickGrid:
+    """
+    Uniform grid over the bricks of a BrickStore, so a collision check only
+    has to look at the bricks in the cells the ball overlaps instead of
+    every brick.
+
+    Cells are one brick in size. A brick is filed, by its store index,
+    under every cell its edges touch. Bricks are never taken out again:
+    queries skip the ones the store no longer has alive, so the store's
+    alive flags are all there is to keep up to date. Candidates come back
+    in the order the bricks were added, so the first brick hit is the same
+    one a scan of the brick list finds.
+    """
+
+    def __init__(self, store, cell_width=CONSTANTS.BRICK_WIDTH, cell_height=CONSTANTS.BRICK_HEIGHT):
+        self.store = store
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cells = {}
+        xs, ys, ws, hs = store.x, store.y, store.w, store.h
+        for i in range(len(xs)):
+            columns, rows = self.cell_range(xs[i], ys[i], xs[i] + ws[i], ys[i] + hs[i])
+            for cx in columns:
+                for cy in rows:
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def __len__(self):
+        return len(self.store)
+
+    def cell_range(self, left, top, right, bottom):
+        # cells overlapping the open area between the edges, which may be floats
+        return (range(math.floor(left / self.cell_width), math.ceil(right / self.cell_width)),
+                range(math.floor(top / self.cell_height), math.ceil(bottom / self.cell_height)))
+
+    def query(self, rect):
+        # Indices of the live bricks in the cells rect overlaps, oldest
+        # first. They may not actually overlap rect; that is left to the
+        # caller.
+        return self.query_area(*rect_edges(rect))
+
+    def query_area(self, left, top, right, bottom):
+        columns, rows = self.cell_range(left, top, right, bottom)
+        cells = self.cells
+        found = set()
+        for cx in columns:
+            for cy in rows:
+                found.update(cells.get((cx, cy), ()))
+        alive = self.store.alive
+        return [i for i in sorted(found) if alive[i]]
+
+
+def rect_edges(rect):
+    return rect.left, rect.top, rect.right, rect.bottom
@@ -0,0 +1,150 @@
+from array import array
+from itertools import compress
+
+import pygame
+
+from .BrickGrid import BrickGrid
+
+
+class BrickStore:
+    """
+    Structure-of-arrays storage for the bricks of a level.
+
+    Every brick is one row across a set of flat arrays (position, size,
+    hits left, kind, color, ...), so a level of any size is a handful of
+    compact buffers rather than one Python object per brick. The Brick
+    classes are small views holding just (store, index); the whole store
+    can also be collided against or drawn in bulk.
+
+    Colors are kept as indices into the store's palette. Area queries go
+    through the store's BrickGrid, built when first needed, so they only
+    look at the bricks near the area.
+    """
+
+    def __init__(self):
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        self.hits = array("h")
+        self.kind = array("B")
+        self.color = array("B")
+        self.status = array("B")
+        self.extra = array("i")     # per-kind state (see ThanosBrick.count)
+        self.alive = array("B")     # cleared when a brick is removed from play
+        self.palette = []
+        self.color_codes = {}
+        self.owner = None           # told when bricks change (see Brick.set_hits)
+        self.dirty = []             # bricks whose color or alive changed since the last draw
+        self.unlock_time = 0        # ms of play before Thanos bricks unlock (see Levels.build_level)
+        self.grid = None            # BrickGrid over the bricks, built when first needed
+
+    def __len__(self):
+        return len(self.x)
+
+    def color_code(self, color):
+        code = self.color_codes.get(color)
+        if code is None:
+            code = self.color_codes[color] = len(self.palette)
+            self.palette.append(color)
+        return code
+
+    def add(self, kind, x, y, w, h, hits, color, status):
+        # Append a brick and return its index.
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+        self.hits.append(hits)
+        self.kind.append(kind)
+        self.color.append(self.color_code(color))
+        self.status.append(status)
+        self.extra.append(0)
+        self.alive.append(1)
+        self.grid = None
+        return len(self.x) - 1
+
+    def extend(self, kinds, xs, ys, w, h, kind_hits, kind_colors, status):
+        # Append a brick per entry of the kinds, xs and ys arrays, all w x h,
+        # with the hits and color of their kind. Returns their indices.
+        start = len(self.x)
+        count = len(kinds)
+        hits_table = bytes(hits & 0xff for hits in kind_hits).ljust(256, b"\0")
+        color_table = bytes(self.color_code(color) for color in kind_colors).ljust(256, b"\0")
+        kind_bytes = kinds.tobytes()
+        self.x.extend(xs)
+        self.y.extend(ys)
+        self.w.extend(array("i", [w]) * count)
+        self.h.extend(array("i", [h]) * count)
+        self.hits.extend(array("h", array("b", kind_bytes.translate(hits_table))))
+        self.kind.extend(kinds)
+        self.color.frombytes(kind_bytes.translate(color_table))
+        self.status.extend(array("B", [status]) * count)
+        self.extra.extend(array("i", [0]) * count)
+        self.alive.extend(array("B", [1]) * count)
+        self.grid = None
+        return range(start, start + count)
+
+    def rect(self, index):
+        return pygame.Rect(self.x[index], self.y[index], self.w[index], self.h[index])
+
+    def edges(self, index):
+        # (left, top, right, bottom) of a brick, without making a Rect
+        x, y = self.x[index], self.y[index]
+        return x, y, x + self.w[index], y + self.h[index]
+
+    def set_color(self, index, color):
+        code = self.color_code(color)
+        if self.color[index] != code:
+            self.color[index] = code
+            self.dirty.append(index)
+
+    def set_alive(self, index, alive):
+        if self.alive[index] != alive:
+            self.alive[index] = alive
+            self.dirty.append(index)
+
+    def build_grid(self):
+        self.grid = BrickGrid(self)
+        return self.grid
+
+    def candidates(self, left, top, right, bottom):
+        # indices of the live bricks in the grid cells the area (which may
+        # have float edges) overlaps, in the order added
+        grid = self.grid
+        if grid is None:
+            grid = self.build_grid()
+        return grid.query_area(left, top, right, bottom)
+
+    def colliding(self, left, top, right, bottom):
+        # indices of the live bricks overlapping the area (whole pixels), in
+        # the order added
+        xs, ys, ws, hs = self.x, self.y, self.w, self.h
+        return [i for i in self.candidates(left, top, right, bottom)
+                if xs[i] < right and xs[i] + ws[i] > left and ys[i] < bottom and ys[i] + hs[i] > top]
+
+    def draw(self, surface, indices=None):
+        # draw every live brick, or the live ones among indices, in the order added
+        fill = surface.fill
+        palette = self.palette
+        xs, ys, ws, hs, colors, alive = self.x, self.y, self.w, self.h, self.color, self.alive
+        if indices is None:
+            indices = compress(range(len(xs)), alive)
+            self.dirty = []
+        else:
+            indices = [i for i in indices if alive[i]]
+        for i in indices:
+            fill(palette[colors[i]], (xs[i], ys[i], ws[i], hs[i]))
+
+    def redraw(self, surface, background):
+        # Bring a surface the bricks were drawn on up to date with the bricks
+        # changed since: each changed brick's area is cleared and everything
+        # overlapping it drawn again, so bricks over or under it stay right.
+        dirty, self.dirty = self.dirty, []
+        for index in dict.fromkeys(dirty):
+            left, top, right, bottom = self.edges(index)
+            surface.set_clip((left, top, right - left, bottom - top))
+            surface.fill(background)
+            self.draw(surface, self.colliding(left, top, right, bottom))
+        surface.set_clip(None)
+
@@ -15,6 +15,9 @@ class Constants:
         self.PADDLE_MOVE_INCREMENT = 10
         self.BALL_VELOCITY = [5, -5]
 
+        # Balls the multi-ball power-up splits the ball into
+        self.MULTIBALL_BALLS = 100
+
         self.MAX_PADDLE_X = self.SCREEN_SIZE[0] - self.PADDLE_WIDTH
         self.MAX_BALL_X   = self.SCREEN_SIZE[0] - self.BALL_DIAMETER
         self.MAX_BALL_Y   = self.SCREEN_SIZE[1] - self.BALL_DIAMETER
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+CACHE_DIR = os.path.join(LEVEL_DIR, "__cache__")
+
+# Brick kinds as numbered in Brick.KINDS, by the names level files use
+KIND_NUMBERS = {"brick": 0, "strong": 1, "unbreakable": 2, "thanos": 3, "camo": 4}
+
+# glyphs of grid rows, unless a level file's "legend" says otherwise
+LEGEND = {"B": "brick", "S": "strong", "U": "unbreakable", "T": "thanos", "C": "camo", ".": None, " ": None}
+
+# magic, version, number of bricks; then the kinds (one byte each), padded
+# to a multiple of 4, and the x and y columns (int32 each)
+CACHE_MAGIC = b"BRKL"
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct("<4sHI")
+
+
+def level_path(number):
+    return os.path.join(LEVEL_DIR, "level_%d.json" % number)
+
+
+def compile_level(source, name="level"):
+    """
+    Turn the JSON text of a level file into (kinds, xs, ys) arrays, one
+    entry per brick, in the order the file lists them.
+
+    A level file holds "grids" of glyph rows, each laid out from an
+    "origin" [x, y] with a "step" [dx, dy] between glyphs, and/or
+    "bricks", a list of [kind, x, y]. Grids come first.
+    """
+    try:
+        level = json.loads(source)
+    except ValueError as error:
+        raise ValueError("%s: not valid JSON: %s" % (name, error))
+    legend = dict(LEGEND)
+    legend.update(level.get("legend", {}))
+    for glyph, kind in legend.items():
+        if kind is not None and kind not in KIND_NUMBERS:
+            raise ValueError("%s: legend maps %r to unknown brick kind %r" % (name, glyph, kind))
+
+    kinds = array("B")
+    xs = array("i")
+    ys = array("i")
+    for g, grid in enumerate(level.get("grids", [])):
+        x0, y0 = grid["origin"]
+        dx, dy = grid["step"]
+        for row, glyphs in enumerate(grid["rows"]):
+            for column, glyph in enumerate(glyphs):
+                if glyph not in legend:
+                    raise ValueError("%s: grid %d row %d has unknown glyph %r" % (name, g, row, glyph))
+                kind = legend[glyph]
+                if kind is not None:
+                    kinds.append(KIND_NUMBERS[kind])
+                    xs.append(x0 + column * dx)
+                    ys.append(y0 + row * dy)
+    for kind, x, y in level.get("bricks", []):
+        if kind not in KIND_NUMBERS:
+            raise ValueError("%s: unknown brick kind %r" % (name, kind))
+        kinds.append(KIND_NUMBERS[kind])
+        xs.append(x)
+        ys.append(y)
+    return kinds, xs, ys
+
+
+def pack_level(kinds, xs, ys):
+    padding = -len(kinds) % 4
+    return (CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(kinds)) + kinds.tobytes() + bytes(padding)
+            + xs.tobytes() + ys.tobytes())
+
+
+def unpack_level(buffer):
+    # (kinds, xs, ys) from a packed level in any buffer (bytes or an mmap)
+    magic, version, count = CACHE_HEADER.unpack_from(buffer)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        raise ValueError("not a version %d compiled level" % CACHE_VERSION)
+    view = memoryview(buffer)
+    start = CACHE_HEADER.size
+    x_start = start + count + (-count % 4)
+    y_start = x_start + 4 * count
+    kinds = array("B")
+    xs = array("i")
+    ys = array("i")
+    kinds.frombytes(view[start:start + count])
+    xs.frombytes(view[x_start:y_start])
+    ys.frombytes(view[y_start:y_start + 4 * count])
+    view.release()
+    return kinds, xs, ys
+
+
+def load_level(path):
+    """
+    The (kinds, xs, ys) of the level file at path. Levels are compiled once
+    into CACHE_DIR, under the hash of the file's contents, and read back
+    from there by memory-mapping the compiled file.
+    """
+    with open(path, "rb") as level_file:
+        source = level_file.read()
+    cache_path = os.path.join(CACHE_DIR, hashlib.sha256(source).hexdigest()[:32] + ".bricks")
+    try:
+        with open(cache_path, "rb") as cache_file, \
+                mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return unpack_level(buffer)
+    except (OSError, ValueError, struct.error):
+        pass
+
+    columns = compile_level(source, os.path.basename(path))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(pack_level(*columns))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # a read-only install still plays, it just compiles every time
+    return columns
@@ -1,127 +1,121 @@
-import sys, pygame
+import os, sys, threading, pygame
+from concurrent.futures import ThreadPoolExecutor
 from .Constants import Constants as Const
 from .Brick import *
-import random
+from .BrickStore import BrickStore
+from .LevelFiles import level_path, load_level
+from homework.common.Rng import RNG, LEVELS
 
 CONSTANTS = Const()
 
+# the next level starts building in the background once only this share of
+# the current level's breakable bricks is left
+PREFETCH_FRACTION = 0.25
+
+# one worker thread, shared by every Levels, builds levels ahead of time
+_prefetcher = None
+
+def prefetcher():
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-prefetch")
+    return _prefetcher
+
 class Levels:
 
-    def __init__(self):
+    def __init__(self, rng=None):
         self.bricks = []
         self.current_level = 0
+        # random stream for the generated levels; pass one in to replay a layout
+        self.rng = RNG.stream(LEVELS) if rng is None else rng
+        self.breakable = 0
+        self.store = None
+        self.prefetch_at = 0
+        self.prefetched = None      # (level number, Future of its build_level)
+        # builds draw from self.rng, so only one runs at a time
+        self.build_lock = threading.Lock()
+        # milliseconds of play so far, for the bricks that change with time
+        self.clock = pygame.time.get_ticks
 
     def getBricks(self):
         return self.bricks
 
     def Load_Next_Level(self):
+        # Swap in the next level, built in the background if it was
+        # prefetched and built now otherwise (e.g. after the cheat jump in
+        # Bricka.cL moved current_level somewhere else).
         self.current_level += 1
-        level = "Level_" + str(self.current_level)
-        try:
-            start_level = getattr(self, level)
-            start_level()
-            return True
-        except AttributeError:
+        prefetched, self.prefetched = self.prefetched, None
+        if prefetched is not None and prefetched[0] == self.current_level:
+            built = prefetched[1].result()
+        else:
+            built = self.build_level(self.current_level)
+        if built is None:
             return False
-
-
-    def Level_1(self):
-        self.bricks = []
-        y_ofs = 35
-        for i in range(7):
-            x_ofs = 35
-            for j in range(8):
-                if not x_ofs % 3:
-                    next_brick = StrongBrick(x_ofs, y_ofs)
-                else:
-                    next_brick = Brick(x_ofs, y_ofs)
-                self.bricks.append(next_brick)
-                x_ofs += CONSTANTS.BRICK_WIDTH + 10
-            y_ofs += CONSTANTS.BRICK_HEIGHT + 5
-
-    def Level_2(self):
-        self.bricks = [
-
-            StrongBrick(65, 125),
-
-            StrongBrick(65 + 2 * (CONSTANTS.BRICK_WIDTH + 15), 125),
-
-            StrongBrick(65 + CONSTANTS.BRICK_WIDTH + 15, 125 + (CONSTANTS.BRICK_HEIGHT + 15)),
-
-            Brick(65 + CONSTANTS.BRICK_WIDTH + 15, 125),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0] - 65 - (CONSTANTS.BRICK_WIDTH + 15), 125),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0] - 65 - 3 * (CONSTANTS.BRICK_WIDTH + 15), 125),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0] - 65 - 2 * (CONSTANTS.BRICK_WIDTH + 15), 125 + (CONSTANTS.BRICK_HEIGHT + 15)),
-
-            Brick(CONSTANTS.SCREEN_SIZE[0] - 65 - 2 * (CONSTANTS.BRICK_WIDTH + 15), 125),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0]//2  - 3 * (CONSTANTS.BRICK_WIDTH + 15) // 2, 255),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0]//2  + (CONSTANTS.BRICK_WIDTH + 15) // 2, 255),
-
-            StrongBrick(CONSTANTS.SCREEN_SIZE[0]//2  - (CONSTANTS.BRICK_WIDTH + 15) // 2, 255 + (CONSTANTS.BRICK_HEIGHT + 15)),
-
-            Brick(CONSTANTS.SCREEN_SIZE[0]//2  - (CONSTANTS.BRICK_WIDTH + 15) // 2, 255),
-
-            UnbreakableBrick(0, 20),
-
-            UnbreakableBrick((CONSTANTS.BRICK_WIDTH + 15), 20),
-
-            UnbreakableBrick(CONSTANTS.SCREEN_SIZE[0] - CONSTANTS.BRICK_WIDTH, 20),
-
-            UnbreakableBrick(CONSTANTS.SCREEN_SIZE[0] - CONSTANTS.BRICK_WIDTH - (CONSTANTS.BRICK_WIDTH + 15), 20),
-        ]
-
-    def Level_3(self):
-        self.bricks = []
-        for j in range(12):
-            a = random.randint(20, 500)
-            b = random.randint(20, 400)
-            brick = Brick(a, b)
-            self.bricks.append(brick)
-
-    def Level_4(self):
-
-        self.bricks = []
-
-        for x in range(0, 9):
-            for y in range(0, 4):
-                self.bricks.append(Brick(x*(CONSTANTS.BRICK_WIDTH + 10) + 10, (CONSTANTS.BRICK_HEIGHT + 10)*y + 75))
-
-        self.bricks.extend(CamoUnbreakableBrick(x * (CONSTANTS.BRICK_WIDTH + 10) + 220, 250) for x in range(3))
-
-        for x in range(0, 3):
-            self.bricks.append(Brick(x*(CONSTANTS.BRICK_WIDTH + 10) + 10, (CONSTANTS.BRICK_HEIGHT + 10)*7 + 75))
-
-        for x in range(6, 9):
-            self.bricks.append(Brick(x*(CONSTANTS.BRICK_WIDTH + 10) + 10, (CONSTANTS.BRICK_HEIGHT + 10)*7 + 75))
-
-    def Level_5(self):
-        self.bricks = []
-        y_ofs = 35
-        count = 0
-        rand_brick = 0
-        for i in range(15):
-            x_ofs = 42
-            for j in range(8):
-                count += 1
-                if (26 <= count <= 27) or (30 <= count <= 31) or (34 <= count <= 35) or (38 <= count <= 39) \
-                        or (count == 65) or (72 <= count <= 73) or (count == 80) or (count == 99) or (count == 102) \
-                        or (count == 107) or (count == 110) or (count == 116) or (count == 117):
-                    next_brick = UnbreakableBrick(x_ofs, y_ofs)
-                elif (52 <= count <= 53) or (60 <= count <= 61) or (count == 82) or (count == 87) or (count == 90) or (count == 95):
-                    next_brick = ThanosBrick(x_ofs, y_ofs)
-                elif (count == 81) or (88 <= count <= 89) or (96 <= count <= 98) or (103 <= count <= 107)  \
-                        or (111 <= count <= 115) or (count >= 118):
-                    pass
-                elif count == 2 or count == 7 or count == 11 or count == 14 or 20 <= count <= 21:
-                    next_brick = Brick(x_ofs, y_ofs)
-                else:
-                    next_brick = StrongBrick(x_ofs, y_ofs)
-
-                (self.bricks).append(next_brick)
-                x_ofs += CONSTANTS.BRICK_WIDTH + 10
-            y_ofs += CONSTANTS.BRICK_HEIGHT + 5
\ No newline at end of file
+        self.store, self.bricks = built
+        self.track_bricks()
+        self.prefetch_at = max(1, int(self.breakable * PREFETCH_FRACTION))
+        return True
+
+    def build_level(self, number):
+        # Build level number into a new store and return (store, bricks), or
+        # None if there is no such level. Levels come from
+        # levels/level_N.json when there is one, and from a generating
+        # Level_N method otherwise, which is given the store to build into.
+        # Runs on the prefetch thread too.
+        with self.build_lock:
+            store = BrickStore()
+            path = level_path(number)
+            if os.path.exists(path):
+                bricks = self.load_level_file(path, store)
+            else:
+                make_level = getattr(self, "Level_" + str(number), None)
+                if make_level is None:
+                    return None
+                bricks = make_level(store)
+            store.unlock_time = self.rng.randint(*ThanosBrick.UNLOCK_TIMES)
+            # index the bricks now, so a prefetched level comes with its grid
+            store.build_grid()
+            return store, bricks
+
+    def has_level(self, number):
+        return os.path.exists(level_path(number)) or hasattr(self, "Level_" + str(number))
+
+    def prefetch(self, number):
+        # start building level number in the background, if not already
+        if self.prefetched is None or self.prefetched[0] != number:
+            self.prefetched = (number, prefetcher().submit(self.build_level, number))
+
+    def load_level_file(self, path, store):
+        kinds, xs, ys = load_level(path)
+        indices = store.extend(kinds, xs, ys, CONSTANTS.BRICK_WIDTH, CONSTANTS.BRICK_HEIGHT,
+                               [kind.HITS for kind in KINDS], [kind.COLOR for kind in KINDS],
+                               Brick.STATUS.NORMAL)
+        return [brick_view(store, index) for index in indices]
+
+    def track_bricks(self):
+        # Count the breakable bricks of the level just built and have them
+        # report changes, so a cleared level shows up without a scan.
+        unique = {id(brick): brick for brick in self.bricks}
+        self.breakable = 0
+        for brick in unique.values():
+            brick.owner = self
+            if brick.hits_to_break > 0:
+                self.breakable += 1
+
+    def on_brick_changed(self, brick, breakable):
+        self.breakable += 1 if breakable else -1
+        if self.breakable <= self.prefetch_at:
+            self.prefetch(self.current_level + 1)
+
+    def is_cleared(self):
+        return self.breakable == 0
+
+    def Level_3(self, store):
+        bricks = []
+        xs = self.rng.randints(20, 500, 12)
+        ys = self.rng.randints(20, 400, 12)
+        for a, b in zip(xs, ys):
+            brick = Brick(store, a, b)
+            bricks.append(brick)
+        return bricks
@@ -0,0 +1,113 @@
+LEFT_WALL = "left wall"
+RIGHT_WALL = "right wall"
+TOP_WALL = "top wall"
+BOTTOM_WALL = "bottom wall"
+
+# most impacts resolved in one move; anything left after that is dropped
+MAX_BOUNCES = 16
+
+
+def sweep(x, y, w, h, dx, dy, left, top, right, bottom):
+    """
+    Swept AABB test: when a w x h box at (x, y) moving by (dx, dy) first
+    touches the box with the given edges. Returns (t, hit_x, hit_y), t being
+    the fraction of the move done at impact and hit_x/hit_y the faces hit
+    (both for a corner), or None if the box misses it, moves away from it or
+    already overlaps it.
+    """
+    # shrink the moving box to a point by growing the other by its size
+    left -= w
+    top -= h
+
+    if dx > 0:
+        x_entry, x_exit = (left - x) / dx, (right - x) / dx
+    elif dx < 0:
+        x_entry, x_exit = (right - x) / dx, (left - x) / dx
+    elif left < x < right:
+        x_entry, x_exit = float("-inf"), float("inf")
+    else:
+        return None
+
+    if dy > 0:
+        y_entry, y_exit = (top - y) / dy, (bottom - y) / dy
+    elif dy < 0:
+        y_entry, y_exit = (bottom - y) / dy, (top - y) / dy
+    elif top < y < bottom:
+        y_entry, y_exit = float("-inf"), float("inf")
+    else:
+        return None
+
+    entry = max(x_entry, y_entry)
+    if entry < 0 or entry >= 1 or entry >= min(x_exit, y_exit):
+        return None
+    return entry, x_entry == entry, y_entry == entry
+
+
+def sweep_bounds(x, y, dx, dy, bounds):
+    """
+    When a box with its top left at (x, y) moving by (dx, dy) reaches the
+    edge of bounds, the (min_x, min_y, max_x, max_y) it has to keep its top
+    left within. Returns (t, wall) for the first wall reached, or None.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    hit = None
+    if dx > 0 and x + dx >= max_x:
+        hit = (max(0.0, (max_x - x) / dx), RIGHT_WALL)
+    elif dx < 0 and x + dx <= min_x:
+        hit = (max(0.0, (min_x - x) / dx), LEFT_WALL)
+    if dy > 0 and y + dy >= max_y:
+        t = max(0.0, (max_y - y) / dy)
+        if hit is None or t < hit[0]:
+            hit = (t, BOTTOM_WALL)
+    elif dy < 0 and y + dy <= min_y:
+        t = max(0.0, (min_y - y) / dy)
+        if hit is None or t < hit[0]:
+            hit = (t, TOP_WALL)
+    return hit
+
+
+def advance(x, y, w, h, vx, vy, bounds, candidates, collide, dt=1.0):
+    """
+    Move a w x h box from (x, y) by dt steps of velocity (vx, vy), resolving
+    every impact on the way in time order, so nothing is tunnelled through
+    however fast the box goes.
+
+    candidates(left, top, right, bottom) returns the (left, top, right,
+    bottom, thing) boxes that might lie in the swept area, in priority order
+    for hits at the same time. collide(thing, x, y, vx, vy, hit_x, hit_y) is
+    called at each impact, with thing one of the boxes' things or a wall
+    name, and returns the velocity
+    to carry on with, or None to stop the box where it is.
+
+    Returns the new (x, y, vx, vy).
+    """
+    remaining = dt
+    for bounce in range(MAX_BOUNCES):
+        dx = vx * remaining
+        dy = vy * remaining
+        if not dx and not dy:
+            break
+
+        best = None
+        wall = sweep_bounds(x, y, dx, dy, bounds)
+        if wall is not None:
+            t, name = wall
+            best = (t, name in (LEFT_WALL, RIGHT_WALL), name in (TOP_WALL, BOTTOM_WALL), name)
+        area = (min(x, x + dx), min(y, y + dy), max(x, x + dx) + w, max(y, y + dy) + h)
+        for left, top, right, bottom, thing in candidates(*area):
+            hit = sweep(x, y, w, h, dx, dy, left, top, right, bottom)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit + (thing,)
+
+        if best is None:
+            return x + dx, y + dy, vx, vy
+
+        t, hit_x, hit_y, thing = best
+        x += dx * t
+        y += dy * t
+        remaining *= 1 - t
+        velocity = collide(thing, x, y, vx, vy, hit_x, hit_y)
+        if velocity is None:
+            break
+        vx, vy = velocity
+    return x, y, vx, vy
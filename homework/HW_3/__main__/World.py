@@ -0,0 +1,283 @@
+import math
+
+import numpy as np
+
+from .Constants import Constants as Consts
+from .Levels import Levels
+from .Physics import MAX_BOUNCES
+
+CONSTANTS = Consts()
+
+BALL = CONSTANTS.BALL_DIAMETER
+# the (x, y) a ball's top left is kept within, as Bricka.move_ball bounds it
+LIMITS = np.array([CONSTANTS.MAX_BALL_X, CONSTANTS.MAX_BALL_Y], dtype=np.float64)
+
+# what a ball hit, where it isn't a brick (those are their store indices)
+NOTHING = -1
+PADDLE = -2
+LEFT_WALL = -3
+RIGHT_WALL = -4
+TOP_WALL = -5
+BOTTOM_WALL = -6
+
+
+class BrickaWorld:
+    """
+    The ball physics of Bricka without a window: any number of balls,
+    stepped together with their positions and velocities held in NumPy
+    arrays, against the paddle and one level's bricks.
+
+    The rules are those of Physics.advance, which moves the single ball:
+    every ball is swept along its velocity and bounces off the walls, the
+    paddle and the bricks in the order it reaches them, so fast balls don't
+    pass through anything. Each pass works out the next impact of every
+    ball still moving at once; the bricks a ball could reach are looked up
+    in the store's BrickGrid rather than tried one by one. Bricks are hit
+    through their Brick views, so their kinds behave as in the game and the
+    level's breakable count stays right.
+    """
+
+    def __init__(self, store, bricks, remove_brick=None):
+        self.store = store
+        # the views of the level's bricks, by store index; hits go through these
+        self.views = {brick.index: brick for brick in bricks}
+        # called with every brick a hit breaks; Bricka passes its own
+        self.remove_brick = remove_brick
+        # bricks never move, so their edges are copied once: (left, top)
+        # grown by the ball's size, as Physics.sweep grows them, and
+        # (right, bottom)
+        self.low = np.column_stack([np.array(store.x, dtype=np.float64),
+                                    np.array(store.y, dtype=np.float64)]).reshape(-1, 2) - BALL
+        self.high = np.column_stack([np.array(store.x, dtype=np.float64) + np.array(store.w, dtype=np.float64),
+                                     np.array(store.y, dtype=np.float64) + np.array(store.h, dtype=np.float64)]).reshape(-1, 2)
+        self.index_cells(store.grid if store.grid is not None else store.build_grid())
+
+        self.pos = np.zeros((0, 2))     # top left of every ball in play
+        self.vel = np.zeros((0, 2))
+        self.paddle_x = 300
+        self.levels = None
+
+    def index_cells(self, grid):
+        # The grid's cells as flat arrays, row by row over the rectangle of
+        # cells holding bricks: the bricks of cell c are
+        # cell_bricks[cell_start[c]:cell_start[c + 1]], oldest first.
+        keys = list(grid.cells) or [(0, 0)]
+        first = (min(cx for cx, cy in keys), min(cy for cx, cy in keys))
+        columns = max(cx for cx, cy in keys) - first[0] + 1
+        rows = max(cy for cx, cy in keys) - first[1] + 1
+        counts = np.zeros(columns * rows, dtype=np.int64)
+        bricks = []
+        for cy in range(first[1], first[1] + rows):
+            for cx in range(first[0], first[0] + columns):
+                cell = grid.cells.get((cx, cy), ())
+                counts[(cy - first[1]) * columns + cx - first[0]] = len(cell)
+                bricks.extend(cell)
+        self.cell_size = np.array([grid.cell_width, grid.cell_height], dtype=np.float64)
+        self.first_cell = np.array(first, dtype=np.int64)
+        self.cell_span = np.array([columns, rows], dtype=np.int64)
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+        self.cell_bricks = np.array(bricks, dtype=np.int64)
+
+    @classmethod
+    def for_level(cls, number, rng=None):
+        # a world on level number, built as the game builds it, or None if
+        # there is no such level
+        levels = Levels(rng)
+        levels.current_level = number - 1
+        if not levels.Load_Next_Level():
+            return None
+        world = cls(levels.store, levels.getBricks())
+        world.levels = levels
+        return world
+
+    def __len__(self):
+        return len(self.pos)
+
+    def launch(self, x, y, vx, vy):
+        self.pos = np.vstack([self.pos, [(x, y)]])
+        self.vel = np.vstack([self.vel, [(vx, vy)]])
+
+    def launch_fan(self, x, y, count, speed):
+        # count balls from (x, y), spread evenly over the upward directions
+        angles = np.linspace(math.radians(-150), math.radians(-30), count)
+        self.pos = np.vstack([self.pos, np.tile((x, y), (count, 1))])
+        self.vel = np.vstack([self.vel, np.column_stack([np.cos(angles), np.sin(angles)]) * speed])
+
+    def step(self, dt=1.0):
+        # Move every ball by dt frames, bouncing off whatever it reaches on
+        # the way. Returns the points scored; balls that got past the paddle
+        # are dropped.
+        pos, vel = self.pos, self.vel
+        if not len(pos):
+            return 0
+        self.paddle_contact(pos, vel)
+        remaining = np.full(len(pos), float(dt))
+        moving = np.flatnonzero((vel != 0).any(axis=1))
+        lost = np.zeros(len(pos), dtype=bool)
+        points = 0
+        for bounce in range(MAX_BOUNCES):
+            if not len(moving):
+                break
+            start = pos[moving]
+            move = vel[moving] * remaining[moving, None]
+            t, thing, flip = self.first_hits(start, move)
+
+            # the hits on bricks, one per ball, in ball order; a brick broken
+            # by an earlier ball in this pass is gone, so that ball goes round
+            # again without it
+            retry = np.zeros(len(moving), dtype=bool)
+            on_brick = np.flatnonzero(thing >= 0)
+            for i, index in zip(on_brick.tolist(), thing[on_brick].tolist()):
+                brick = self.views[index]
+                if not brick.alive:
+                    retry[i] = True
+                    continue
+                if brick.hits_to_break > 0:
+                    points += 3
+                brick.onHit()
+                if brick.hits_to_break == 0:
+                    if self.remove_brick is not None:
+                        self.remove_brick(brick)
+                    else:
+                        brick.alive = False
+
+            # everything else moves up to its impact, or all the way, and
+            # carries on as Bricka.ball_hit and paddle_bounce have it
+            go = ~retry
+            balls, t, thing, flip = moving[go], t[go], thing[go], flip[go]
+            pos[balls] = start[go] + move[go] * t[:, None]
+            remaining[balls] *= 1 - t
+            vel[balls] = np.where(flip, -vel[balls], vel[balls])
+            paddle = balls[thing == PADDLE]
+            if len(paddle):
+                vel[paddle] = self.paddle_bounce(pos[paddle, 0], vel[paddle, 1])
+            lost[balls[thing == BOTTOM_WALL]] = True
+            again = (thing != NOTHING) & (thing != BOTTOM_WALL)
+            moving = np.sort(np.concatenate((moving[retry], balls[again])))
+
+        # past the paddle, as in Bricka.handle_collisions
+        lost |= (pos[:, 1] > CONSTANTS.PADDLE_Y) & ~self.on_paddle(pos)
+        if lost.any():
+            self.pos = pos[~lost]
+            self.vel = vel[~lost]
+        return points
+
+    def on_paddle(self, pos):
+        x, y = pos[:, 0], pos[:, 1]
+        paddle = self.paddle_x
+        return ((x < paddle + CONSTANTS.PADDLE_WIDTH) & (x + BALL > paddle)
+                & (y < CONSTANTS.PADDLE_Y + CONSTANTS.PADDLE_HEIGHT) & (y + BALL > CONSTANTS.PADDLE_Y))
+
+    def paddle_contact(self, pos, vel):
+        # balls the paddle was moved into go up off its top, as in Bricka.move_ball
+        on = self.on_paddle(pos)
+        if on.any():
+            pos[on, 1] = CONSTANTS.PADDLE_Y - BALL
+            vel[on] = self.paddle_bounce(pos[on, 0], vel[on, 1])
+
+    def paddle_bounce(self, x, vy):
+        # the same quarters of the paddle as Bricka.paddle_bounce
+        center = x + CONSTANTS.BALL_RADIUS
+        paddle = self.paddle_x
+        width = CONSTANTS.PADDLE_WIDTH
+        vx = np.where(center < paddle + width // 2,
+                      np.where(center < paddle + width // 4, -7, -5),
+                      np.where(center > paddle + 3 * width // 4, 7, 5))
+        return np.column_stack([vx, -np.abs(vy)])
+
+    def first_hits(self, start, move):
+        # For balls at start moving by move: the fraction of the move done
+        # at the first impact (1 for none), what was hit and on which axes
+        # that turns the ball round. Walls come first, then the bricks in
+        # the order added, then the paddle, for impacts at the same time,
+        # as in Physics.advance.
+        t, thing, flip = wall_hits(start, move)
+
+        balls, bricks = self.candidates(start, move)
+        if len(bricks):
+            entry, faces = sweep(start[balls], move[balls], self.low[bricks], self.high[bricks])
+            hit = np.flatnonzero(entry == entry)    # not NaN
+            if len(hit):
+                # the earliest impact of each ball, the oldest brick on a tie
+                hit = hit[np.lexsort((bricks[hit], entry[hit], balls[hit]))]
+                first = hit[np.flatnonzero(np.diff(balls[hit], prepend=-1))]
+                ball = balls[first]
+                better = entry[first] < t[ball]
+                ball, first = ball[better], first[better]
+                t[ball] = entry[first]
+                thing[ball] = bricks[first]
+                flip[ball] = faces[first]
+
+        paddle = self.paddle_x
+        entry, faces = sweep(start, move, (paddle - BALL, CONSTANTS.PADDLE_Y - BALL),
+                             (paddle + CONSTANTS.PADDLE_WIDTH, CONSTANTS.PADDLE_Y + CONSTANTS.PADDLE_HEIGHT))
+        better = entry < t
+        if better.any():
+            t[better] = entry[better]
+            thing[better] = PADDLE
+            flip[better] = faces[better]
+        return t, thing, flip
+
+    def candidates(self, start, move):
+        # (ball, brick) pairs for the live bricks in the grid cells each
+        # ball's swept area overlaps, as BrickStore.candidates finds them;
+        # a brick in several of those cells comes up once for each
+        if not len(self.cell_bricks):
+            return self.cell_bricks, self.cell_bricks
+        end = start + move
+        first = np.maximum(np.floor(np.minimum(start, end) / self.cell_size).astype(np.int64) - self.first_cell, 0)
+        stop = np.minimum(np.ceil((np.maximum(start, end) + BALL) / self.cell_size).astype(np.int64) - self.first_cell,
+                          self.cell_span)
+        span = np.maximum(stop - first, 0)
+        width = span[:, 0]
+        cells_per_ball = width * span[:, 1]
+
+        # every (ball, cell) ...
+        owner = np.repeat(np.arange(len(start)), cells_per_ball)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(cells_per_ball) - cells_per_ball, cells_per_ball)
+        cell = (first[owner, 1] + k // width[owner]) * self.cell_span[0] + first[owner, 0] + k % width[owner]
+        # ... and every brick in those cells
+        begin = self.cell_start[cell]
+        count = self.cell_start[cell + 1] - begin
+        balls = np.repeat(owner, count)
+        k = np.arange(len(balls)) - np.repeat(np.cumsum(count) - count, count)
+        bricks = self.cell_bricks[np.repeat(begin, count) + k]
+
+        live = np.frombuffer(self.store.alive, dtype=np.uint8)[bricks] != 0
+        return balls[live], bricks[live]
+
+
+def wall_hits(start, move):
+    # Physics.sweep_bounds for balls at start moving by move: (t, wall,
+    # flip), t 1 and wall NOTHING where none is reached
+    end = start + move
+    high = (move > 0) & (end >= LIMITS)
+    low = (move < 0) & (end <= 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = np.maximum(0.0, (np.where(high, LIMITS, 0.0) - start) / move)
+    on_x = high[:, 0] | low[:, 0]
+    # a wall on y only counts if it comes strictly before the one on x
+    on_y = (high[:, 1] | low[:, 1]) & ~(on_x & (at[:, 1] >= at[:, 0]))
+    on_x &= ~on_y
+    t = np.where(on_y, at[:, 1], np.where(on_x, at[:, 0], 1.0))
+    thing = np.where(on_y, np.where(high[:, 1], BOTTOM_WALL, TOP_WALL),
+                     np.where(on_x, np.where(high[:, 0], RIGHT_WALL, LEFT_WALL), NOTHING))
+    return t, thing, np.column_stack([on_x, on_y])
+
+
+def sweep(start, move, low, high):
+    # Physics.sweep for balls at start moving by move against boxes whose
+    # (left, top) grown by the ball's size is low and (right, bottom) high:
+    # the fraction of the move done at impact (NaN where there is none) and
+    # which faces were hit. Standing still on an axis, the times come out
+    # as x / 0.0 gives them: -inf and inf inside the box's range, never
+    # entering (inf, or NaN on its edges) outside it; -0.0 is made 0.0
+    # first so its sign doesn't turn them round.
+    move = move + 0.0
+    ahead = move >= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        enter = (np.where(ahead, low, high) - start) / move
+        leave = (np.where(ahead, high, low) - start) / move
+    entry = enter.max(axis=1)
+    entry[~((entry >= 0) & (entry < 1) & (entry < leave.min(axis=1)))] = np.nan
+    return entry, enter == entry[:, None]
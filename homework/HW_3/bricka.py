@@ -11,6 +11,14 @@ import tkinter
 import pygame
 from homework.HW_3.__main__.Constants import Constants as Consts
 from homework.HW_3.__main__.Levels import Levels
+from homework.HW_3.__main__.Physics import advance, LEFT_WALL, RIGHT_WALL, TOP_WALL, BOTTOM_WALL
+from homework.common.TextCache import render_text
+from homework.common.Profiler import PROFILER, INPUT, UPDATE, COLLISION, DRAW, FLIP
+
+try:
+    from homework.HW_3.__main__.World import BrickaWorld
+except ImportError:
+    BrickaWorld = None  # no NumPy: no multi-ball
 
 CONSTANTS = Consts()
 
@@ -22,6 +30,11 @@ class Bricka:
         
         self.screen = pygame.display.set_mode(CONSTANTS.SCREEN_SIZE)
         pygame.display.set_caption("bricka (a breakout clone by codeNtronix.com)")
+
+        # the bricks, drawn over the background once and then only where they
+        # change (see draw_bricks); it covers the whole screen every frame
+        self.brick_layer = pygame.Surface(CONSTANTS.SCREEN_SIZE).convert()
+        self.brick_layer_store = None
         
         self.clock = pygame.time.Clock()
 
@@ -48,16 +61,34 @@ class Bricka:
         keep_going = self.levels.Load_Next_Level()
         if keep_going:
             self.bricks = self.levels.getBricks()
+            # the views of the level's bricks, by store index, for what
+            # the store's grid finds in the ball's way
+            self.brick_views = {brick.index: brick for brick in self.bricks}
             self.paddle = pygame.Rect(300, CONSTANTS.PADDLE_Y, CONSTANTS.PADDLE_WIDTH, CONSTANTS.PADDLE_HEIGHT)
             self.ball = pygame.Rect(300, CONSTANTS.PADDLE_Y - CONSTANTS.BALL_DIAMETER, CONSTANTS.BALL_DIAMETER,
                                     CONSTANTS.BALL_DIAMETER)
+            # exact position of the ball; self.ball is that rounded to pixels
+            self.ball_pos = self.ball.topleft
+            # the balls while multi-ball is on, None otherwise
+            self.world = None
             self.state = CONSTANTS.STATE_BALL_IN_PADDLE
         else:
             self.state = CONSTANTS.STATE_WON
 
+    def remove_brick(self, brick):
+        self.bricks.remove(brick)
+        brick.alive = False
+
     def draw_bricks(self):
-        for brick in self.bricks:
-            pygame.draw.rect(self.screen, brick.color, brick.rect)
+        store = self.levels.store
+        if store is not self.brick_layer_store:
+            # a new level: draw all of it
+            self.brick_layer.fill(CONSTANTS.BLACK)
+            store.draw(self.brick_layer)
+            self.brick_layer_store = store
+        else:
+            store.redraw(self.brick_layer, CONSTANTS.BLACK)
+        self.screen.blit(self.brick_layer, (0, 0))
         
     def check_input(self):
 
@@ -143,11 +174,14 @@ class Bricka:
                     CONSTANTS.STATE_CL = 6
 
 
+                if event.key == pygame.K_m and self.state == CONSTANTS.STATE_PLAYING and self.world is None and BrickaWorld is not None:
+                    self.start_multiball()
+
                 if event.key == pygame.K_z:
                     for brick in self.bricks:
                         brick.onHit()
                         if brick.hits_to_break == 0:
-                            self.bricks.remove(brick)
+                            self.remove_brick(brick)
 
                 if event.key == pygame.K_b and self.state == CONSTANTS.STATE_BALL_IN_PADDLE and self.levels.current_level == 1 and self.lives == 3 and CONSTANTS.STATE_CL == 14:
                     CONSTANTS.STATE_CL += 1
@@ -161,72 +195,93 @@ class Bricka:
 
 
 
-    def move_ball(self):
-        self.ball.left += self.ball_vel[0]
-        self.ball.top  += self.ball_vel[1]
+    def move_ball(self, dt=1.0):
+        # Sweep the ball along its velocity for dt frames, bouncing off the
+        # walls, the paddle and the bricks in the order it reaches them, so
+        # it can't pass through anything however fast it goes.
+        x, y = self.ball_pos
+        if (round(x), round(y)) != self.ball.topleft:
+            # the ball was put somewhere else (e.g. sitting on the paddle)
+            x, y = self.ball.topleft
 
-        if self.ball.left <= 0:
-            self.ball.left = 0
-            self.ball_vel[0] = -self.ball_vel[0]
-        elif self.ball.left >= CONSTANTS.MAX_BALL_X:
-            self.ball.left = CONSTANTS.MAX_BALL_X
-            self.ball_vel[0] = -self.ball_vel[0]
-        
-        if self.ball.top < 0:
-            self.ball.top = 0
-            self.ball_vel[1] = -self.ball_vel[1]
-        elif self.ball.top >= CONSTANTS.MAX_BALL_Y:
-            self.ball.top = CONSTANTS.MAX_BALL_Y
-            self.ball_vel[1] = -self.ball_vel[1]
-
-    def handle_collisions(self):
-        for brick in self.bricks:
-            if self.ball.colliderect(brick.rect):
-                if brick.hits_to_break > 0:
-                    self.score += 3
-                if (self.ball.right - self.ball_vel[0] <= brick.rect.left or self.ball.left - self.ball_vel[0] >= brick.rect.right) and (not (self.ball.bottom - 2 < brick.rect.top or self.ball.top + 2 > brick.rect.bottom)):
-                    self.ball_vel[0] = -self.ball_vel[0]
-                    if self.ball.right + self.ball_vel[0] <= brick.rect.left:
-                        self.ball.right = brick.rect.left + self.ball_vel[0]
-                    if self.ball.left + self.ball_vel[0] >= brick.rect.right:
-                        self.ball.left = brick.rect.right + self.ball_vel[0]
-                else:
-                    self.ball_vel[1] = -self.ball_vel[1]
-                    if self.ball.bottom + self.ball_vel[1] < brick.rect.top:
-                        self.ball.bottom = brick.rect.top + self.ball_vel[1]
-                    if self.ball.top + self.ball_vel[1] >= brick.rect.bottom:
-                        self.ball.top = brick.rect.bottom + self.ball_vel[1]
-
-                brick.onHit()
-                if brick.hits_to_break == 0:
-                    self.bricks.remove(brick)
-                break
-
-        temp_state = self.state
-        self.state = CONSTANTS.STATE_GET_NEXT_LEVEL
-        for brick in self.bricks:
+        vx, vy = self.ball_vel
+        if self.ball.colliderect(self.paddle):
+            # the paddle was moved into the ball
+            y = CONSTANTS.PADDLE_Y - CONSTANTS.BALL_DIAMETER
+            vx, vy = self.paddle_bounce(x, vy)
+
+        bounds = (0, 0, CONSTANTS.MAX_BALL_X, CONSTANTS.MAX_BALL_Y)
+        x, y, vx, vy = advance(x, y, CONSTANTS.BALL_DIAMETER, CONSTANTS.BALL_DIAMETER, vx, vy,
+                               bounds, self.ball_candidates, self.ball_hit, dt)
+        self.ball_pos = (x, y)
+        self.ball.topleft = (round(x), round(y))
+        self.ball_vel[0], self.ball_vel[1] = vx, vy
+
+    def start_multiball(self):
+        # split the ball into a fan of balls, moved together by a BrickaWorld
+        self.world = BrickaWorld(self.levels.store, self.bricks, self.remove_brick)
+        vx, vy = self.ball_vel
+        self.world.launch_fan(self.ball_pos[0], self.ball_pos[1], CONSTANTS.MULTIBALL_BALLS, (vx * vx + vy * vy) ** 0.5)
+
+    def move_balls(self):
+        self.world.paddle_x = self.paddle.left
+        self.score += self.world.step()
+
+    def ball_candidates(self, left, top, right, bottom):
+        # what the ball could hit moving through the area: bricks first, as
+        # they always were, then the paddle
+        store = self.levels.store
+        xs, ys, ws, hs = store.x, store.y, store.w, store.h
+        views = self.brick_views
+        candidates = []
+        for i in store.candidates(left, top, right, bottom):
+            candidates.append((xs[i], ys[i], xs[i] + ws[i], ys[i] + hs[i], views[i]))
+        paddle = self.paddle
+        candidates.append((paddle.left, paddle.top, paddle.right, paddle.bottom, paddle))
+        return candidates
+
+    def ball_hit(self, thing, x, y, vx, vy, hit_x, hit_y):
+        # What happens when the ball touches thing; returns its new velocity.
+        if thing == BOTTOM_WALL:
+            return None  # missed the paddle; handle_collisions takes a life
+        if thing is self.paddle:
+            return self.paddle_bounce(x, vy)
+        if thing not in (LEFT_WALL, RIGHT_WALL, TOP_WALL):
+            brick = thing
             if brick.hits_to_break > 0:
-                self.state = temp_state
+                self.score += 3
+            brick.onHit()
+            if brick.hits_to_break == 0:
+                self.remove_brick(brick)
+        return (-vx if hit_x else vx), (-vy if hit_y else vy)
+
+    def paddle_bounce(self, x, vy):
+        # the ball goes back up, angled by where on the paddle it landed
+        center = x + CONSTANTS.BALL_RADIUS
+        if (center < self.paddle.left + (CONSTANTS.PADDLE_WIDTH // 2)):
+            if (center < self.paddle.left + (CONSTANTS.PADDLE_WIDTH // 4)):
+                vx = -7
             else:
-                continue
-
-            
-        if self.ball.colliderect(self.paddle):
-            self.ball.top = CONSTANTS.PADDLE_Y - CONSTANTS.BALL_DIAMETER
-            self.ball_vel[1] = -self.ball_vel[1]
-
-            if (self.ball.left + CONSTANTS.BALL_RADIUS < self.paddle.left + (CONSTANTS.PADDLE_WIDTH // 2)):
-                if (self.ball.left + CONSTANTS.BALL_RADIUS < self.paddle.left + (CONSTANTS.PADDLE_WIDTH // 4)):
-                    self.ball_vel[0] = -7
-                else:
-                    self.ball_vel[0] = -5
+                vx = -5
+        else:
+            if (center > self.paddle.left + (3 * CONSTANTS.PADDLE_WIDTH // 4)):
+                vx = 7
             else:
-                if (self.ball.left + CONSTANTS.BALL_RADIUS > self.paddle.left + (3 * CONSTANTS.PADDLE_WIDTH // 4)):
-                    self.ball_vel[0] = 7
-                else:
-                    self.ball_vel[0] = 5
+                vx = 5
+        return vx, -abs(vy)
 
-        elif self.ball.top > self.paddle.top:
+    def handle_collisions(self):
+        # the ball has already bounced off everything it touched on the way
+        # (see move_ball); what is left is the outcome of its move
+        if self.levels.is_cleared():
+            self.state = CONSTANTS.STATE_GET_NEXT_LEVEL
+
+        if self.world is not None:
+            lost = not len(self.world)
+        else:
+            lost = self.ball.top > self.paddle.top and not self.ball.colliderect(self.paddle)
+        if lost:
+            self.world = None
             self.lives -= 1
             if self.lives > 0:
                 self.state = CONSTANTS.STATE_BALL_IN_PADDLE
@@ -235,7 +290,7 @@ class Bricka:
 
     def show_stats(self):
         if self.font:
-            font_surface = self.font.render("SCORE: " + str(self.score) + " LIVES: " + str(self.lives), False, CONSTANTS.WHITE)
+            font_surface = render_text(self.font, "SCORE: " + str(self.score) + " LIVES: " + str(self.lives), False, CONSTANTS.WHITE)
             self.screen.blit(font_surface, (205,5))
 
     def cL(self):
@@ -257,7 +312,7 @@ class Bricka:
     def show_message(self,message):
         if self.font:
             size = self.font.size(message)
-            font_surface = self.font.render(message,False, CONSTANTS.WHITE)
+            font_surface = render_text(self.font, message, False, CONSTANTS.WHITE)
             x = (CONSTANTS.SCREEN_SIZE[0] - size[0]) / 2
             y = (CONSTANTS.SCREEN_SIZE[1] - size[1]) / 2
             self.screen.blit(font_surface, (x,y))
@@ -280,39 +335,57 @@ class Bricka:
         while 1:
 
             self.clock.tick(50)
-            self.screen.fill(CONSTANTS.BLACK)
-            self.check_input()
+            with PROFILER.phase(INPUT):
+                self.check_input()
 
-            self.checkForQuit()
+                self.checkForQuit()
 
+            message = None
             if self.state == CONSTANTS.STATE_PLAYING:
-                self.move_ball()
-                self.handle_collisions()
+                with PROFILER.phase(UPDATE):
+                    if self.world is not None:
+                        self.move_balls()
+                    else:
+                        self.move_ball()
+                with PROFILER.phase(COLLISION):
+                    self.handle_collisions()
             elif self.state == CONSTANTS.STATE_BALL_IN_PADDLE:
                 self.ball.left = self.paddle.left + self.paddle.width / 2
                 self.ball.top  = self.paddle.top - self.ball.height
-                self.show_message("PRESS SPACE TO LAUNCH THE BALL")
+                message = "PRESS SPACE TO LAUNCH THE BALL"
             elif self.state == CONSTANTS.STATE_GAME_OVER:
-                self.show_message("GAME OVER. PRESS ENTER TO PLAY AGAIN")
+                message = "GAME OVER. PRESS ENTER TO PLAY AGAIN"
             elif self.state == CONSTANTS.STATE_WON:
-                self.show_message("YOU WON! PRESS ENTER TO PLAY AGAIN")
+                message = "YOU WON! PRESS ENTER TO PLAY AGAIN"
             elif self.state == CONSTANTS.STATE_GET_NEXT_LEVEL:
-                self.show_message("LEVEL COMPLETE!  PRESS ENTER TO CONTINUE!")
+                message = "LEVEL COMPLETE!  PRESS ENTER TO CONTINUE!"
             elif self.state == CONSTANTS.STATE_START_NEXT_LEVEL:
-                self.init_next_level()
+                with PROFILER.phase(UPDATE):
+                    self.init_next_level()
 
-            self.draw_bricks()
+            with PROFILER.phase(DRAW):
+                # the brick layer covers the whole screen, so it goes first
+                self.draw_bricks()
+                if message:
+                    self.show_message(message)
 
-            # Draw paddle
-            pygame.draw.rect(self.screen, CONSTANTS.BLUE, self.paddle)
+                # Draw paddle
+                pygame.draw.rect(self.screen, CONSTANTS.BLUE, self.paddle)
 
 
-            # Draw ball
-            pygame.draw.circle(self.screen, CONSTANTS.WHITE, (self.ball.left + CONSTANTS.BALL_RADIUS, self.ball.top + CONSTANTS.BALL_RADIUS), CONSTANTS.BALL_RADIUS)
+                # Draw ball
+                if self.world is not None:
+                    for x, y in self.world.pos.tolist():
+                        pygame.draw.circle(self.screen, CONSTANTS.WHITE, (round(x) + CONSTANTS.BALL_RADIUS, round(y) + CONSTANTS.BALL_RADIUS), CONSTANTS.BALL_RADIUS)
+                else:
+                    pygame.draw.circle(self.screen, CONSTANTS.WHITE, (self.ball.left + CONSTANTS.BALL_RADIUS, self.ball.top + CONSTANTS.BALL_RADIUS), CONSTANTS.BALL_RADIUS)
 
-            self.show_stats()
+                self.show_stats()
+            PROFILER.draw(self.screen)
 
-            pygame.display.flip()
+            with PROFILER.phase(FLIP):
+                pygame.display.flip()
+            PROFILER.end_frame()
 
 if __name__ == "__main__":
     Bricka().run()
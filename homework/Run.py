@@ -0,0 +1,42 @@
+"""
+Run one of the games or tools from the repository root.
+
+The scripts import the code shared between games as homework.common and
+their own modules as siblings (from Simulation import ...), and load
+their sounds and images from their own directory. This sets that up in
+one place: the script's directory goes on sys.path and becomes the
+working directory, so relative paths given to the script are taken from
+there, as when it was started from that directory.
+
+    python -m homework.Run 2/EvilOrNice/Tetris.py
+    python -m homework.Run 2/EvilOrNice/BatchRunner.py --games 1000 --sweep 5 --output sweep.csv
+    python -m homework.Run 1/PartD/PartD.py
+
+Script paths are relative to the homework directory.
+"""
+import os
+import runpy
+import sys
+
+HOMEWORK = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(__doc__.strip())
+        return 0 if argv else 2
+    script = os.path.join(HOMEWORK, argv[0])
+    if not os.path.isfile(script):
+        print("no such script: %s" % script, file=sys.stderr)
+        return 2
+    directory = os.path.dirname(script)
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+    sys.argv = [script] + list(argv[1:])
+    runpy.run_path(script, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Per-frame timing of the games' main loops.
+
+A game loop wraps each part of its frame in a named phase timer (input,
+update, collision, draw, flip) and calls end_frame() once the frame is on
+screen. FrameProfiler keeps the time spent in every phase, and the whole
+frame including any wait for the frame rate, for the last few hundred frames
+in a ring buffer, so a frame drop can be pinned on the phase that caused it.
+
+    with PROFILER.phase(UPDATE):
+        ...
+    PROFILER.end_frame()
+
+Loops written as one long script can mark where each phase starts instead,
+with PROFILER.begin(UPDATE), and PROFILER.end_phase() before any waiting.
+
+Setting GAMES_PROFILE_OVERLAY draws the p50/p95/p99 of each phase over the
+game; setting GAMES_PROFILE to a file name writes the buffered frames to
+that file as CSV when the game exits.
+"""
+import atexit
+import csv
+import os
+import time
+from array import array
+
+import pygame
+
+from homework.common.TextCache import render_text
+
+# Phase names
+INPUT = "input"
+UPDATE = "update"
+COLLISION = "collision"
+DRAW = "draw"
+FLIP = "flip"
+PHASES = (INPUT, UPDATE, COLLISION, DRAW, FLIP)
+
+# the time from one end_frame() to the next, waiting included
+FRAME = "frame"
+
+PERCENTILES = (50, 95, 99)
+
+
+class PhaseTimer:
+    """Adds the time spent inside a with block to one phase of the frame."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class FrameProfiler:
+
+    def __init__(self, frames=600, phases=PHASES, refresh=25):
+        self.size = frames
+        self.phases = tuple(phases)
+        self.refresh = refresh          # frames between overlay updates
+        self.timers = {}
+        self.open = None                # the timer begin() started
+        self.current = {}               # seconds per phase of the frame in progress
+        self.columns = {name: array("d", [0.0]) * frames for name in (FRAME,) + self.phases}
+        self.used = set()               # phases that have been timed at all
+        self.count = 0
+        self.last = None
+        self.overlay = False
+        self.overlay_font = None
+        self.overlay_rows = []
+
+    def phase(self, name):
+        """The timer for phase name, to use as a with block."""
+        timer = self.timers.get(name)
+        if timer is None:
+            if name not in self.columns:
+                self.phases += (name,)
+                self.columns[name] = array("d", [0.0]) * self.size
+            timer = self.timers[name] = PhaseTimer(self, name)
+        return timer
+
+    def begin(self, name):
+        """End the phase begin() last started, if any, and start phase name."""
+        self.end_phase()
+        self.open = self.phase(name).__enter__()
+
+    def end_phase(self):
+        if self.open is not None:
+            self.open.__exit__(None, None, None)
+            self.open = None
+
+    def end_frame(self):
+        """Store the frame just finished and start the next one."""
+        self.end_phase()
+        now = time.perf_counter()
+        slot = self.count % self.size
+        self.columns[FRAME][slot] = 0.0 if self.last is None else now - self.last
+        self.last = now
+        current = self.current
+        for name in self.phases:
+            self.columns[name][slot] = current.get(name, 0.0)
+        self.used.update(current)
+        current.clear()
+        self.count += 1
+        if self.overlay and self.count % self.refresh == 0:
+            self.overlay_rows = self.summary_rows()
+
+    def frames(self):
+        """The stored frames, oldest first, as (frame, {name: seconds})."""
+        stored = min(self.count, self.size)
+        first = self.count - stored
+        for frame in range(first, self.count):
+            slot = frame % self.size
+            yield frame, {name: column[slot] for name, column in self.columns.items()}
+
+    def percentiles(self, name, percentiles=PERCENTILES):
+        """The given percentiles of phase name over the stored frames, in seconds."""
+        stored = min(self.count, self.size)
+        if not stored:
+            return tuple(0.0 for _ in percentiles)
+        values = sorted(self.columns[name][:stored])
+        return tuple(values[min(stored - 1, stored * p // 100)] for p in percentiles)
+
+    def summary(self):
+        """{name: (p50, p95, p99)} in seconds, for the frame and every phase timed."""
+        names = [FRAME] + [name for name in self.phases if name in self.used]
+        return {name: self.percentiles(name) for name in names}
+
+    def summary_rows(self):
+        rows = [["ms"] + ["p%d" % p for p in PERCENTILES]]
+        for name, values in self.summary().items():
+            rows.append([name] + ["%.1f" % (1000 * value) for value in values])
+        return rows
+
+    def format_summary(self):
+        return "\n".join("%-9s %6s %6s %6s" % tuple(row) for row in self.summary_rows())
+
+    def draw(self, surface, x=5, y=5):
+        """
+        Draw the overlay, if it is on, on surface. Returns the rect drawn
+        (for games that only update what changed), or None.
+        """
+        if not self.overlay or not self.overlay_rows:
+            return None
+        font = self.overlay_font
+        if font is None:
+            font = self.overlay_font = pygame.font.Font(None, 18)
+        line_height = font.get_linesize()
+        name_width, value_width = font.size("collision ")[0], font.size(" 000.0")[0]
+        width = name_width + value_width * len(PERCENTILES) + 6
+        area = pygame.Rect(x, y, width, line_height * len(self.overlay_rows) + 4)
+        surface.fill((0, 0, 0), area)
+        for i, row in enumerate(self.overlay_rows):
+            top = y + 2 + i * line_height
+            surface.blit(render_text(font, row[0], False, (255, 255, 0)), (x + 3, top))
+            for j, value in enumerate(row[1:]):
+                # the timings change every frame, so they skip the cache
+                text = render_text(font, value, False, (255, 255, 0), cache=False)
+                surface.blit(text, (x + 3 + name_width + value_width * (j + 1) - text.get_width(), top))
+        return area
+
+    def export(self, path):
+        """Write the stored frames to path as CSV, one row per frame, in milliseconds."""
+        names = [FRAME] + list(self.phases)
+        with open(path, "w", newline="") as output:
+            writer = csv.writer(output)
+            writer.writerow(["frame"] + [name + "_ms" for name in names])
+            for frame, times in self.frames():
+                writer.writerow([frame] + ["%.3f" % (1000 * times[name]) for name in names])
+
+
+# The profiler shared by every game in the process
+PROFILER = FrameProfiler()
+PROFILER.overlay = bool(os.environ.get("GAMES_PROFILE_OVERLAY"))
+
+if os.environ.get("GAMES_PROFILE"):
+    atexit.register(PROFILER.export, os.environ["GAMES_PROFILE"])
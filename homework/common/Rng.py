@@ -0,0 +1,72 @@
+"""
+Seeded random number streams shared by the games.
+
+Every subsystem that needs randomness (the Tetris piece bag and hole maker,
+the Bricka level generator, the Dodger baddie spawner) draws from its own
+named stream instead of the global random module. All streams are derived
+from one master seed, so a run can be reproduced from that seed alone and
+two subsystems (or two simulations in one process) never disturb each
+other's sequences.
+
+The master seed of the shared RNG service comes from the GAMES_SEED
+environment variable when it is set, and is picked at random otherwise.
+"""
+import hashlib
+import os
+import random
+
+# Stream names
+GAMES = "games"
+PIECES = "pieces"
+HOLES = "holes"
+LEVELS = "levels"
+SPAWNER = "spawner"
+
+
+class RandomStream(random.Random):
+    """A random.Random that can also draw many values in one call."""
+
+    def randints(self, a, b, count):
+        """Return count random integers N with a <= N <= b."""
+        return self.choices(range(a, b + 1), k=count)
+
+    def randoms(self, count):
+        """Return count random floats in [0.0, 1.0)."""
+        rand = self.random
+        return [rand() for _ in range(count)]
+
+
+class RandomService:
+
+    def __init__(self, seed=None):
+        self.streams = {}
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Set a new master seed; existing streams restart from it in place."""
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "big")
+        self.seed = seed
+        for name, stream in self.streams.items():
+            stream.seed(self.stream_seed(name))
+
+    def stream_seed(self, name):
+        # A stable function of (master seed, name), the same in every process
+        digest = hashlib.sha256(("%s:%s" % (self.seed, name)).encode()).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    def stream(self, name):
+        """The stream for one subsystem, created on first use."""
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.streams[name] = RandomStream(self.stream_seed(name))
+        return stream
+
+
+def _environment_seed():
+    seed = os.environ.get("GAMES_SEED")
+    return int(seed) if seed else None
+
+
+# The service shared by every game in the process
+RNG = RandomService(_environment_seed())
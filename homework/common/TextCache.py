@@ -0,0 +1,70 @@
+"""
+Shared cache of rendered text surfaces.
+
+Rasterizing text with Font.render is one of the most expensive things the
+games do each frame, and the strings they draw (scores, levels, prompts)
+rarely change between frames. TextCache keeps the surfaces it renders in a
+least-recently-used table keyed by (font, text, color, antialias, background)
+and hands the same surface back until it is evicted.
+
+Cached surfaces are shared, so callers must only blit them, never draw on
+them. Text that changes nearly every frame (a running score, timings) is
+rendered with cache=False instead: caching it would only push the labels
+that do repeat out of the table.
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color, background=None):
+        """Same arguments as font.render, but returns a cached surface when it can."""
+        key = (font, text, tuple(color), bool(antialias), None if background is None else tuple(background))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        if background is None:
+            surface = font.render(text, antialias, color)
+        else:
+            surface = font.render(text, antialias, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# The cache shared by every game in the process
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, antialias, color, background=None, cache=True):
+    if not cache:
+        if background is None:
+            return font.render(text, antialias, color)
+        return font.render(text, antialias, color, background)
+    return TEXT_CACHE.render(font, text, antialias, color, background)